@@ -1,6 +1,12 @@
 """
 Modern theme system for Cryptex with multiple beautiful themes
+
+The stylesheet of a theme is built once and set on the QApplication, so
+every window shares it. Error and success looks are QSS rules keyed on
+a "state" property, toggled with set_state() instead of new stylesheets.
 """
+from PyQt6.QtWidgets import QApplication
+from core.trace import traced
 
 THEMES = {
     "cyber_blue": {
@@ -61,7 +67,86 @@ THEMES = {
     }
 }
 
+# Used when a theme cannot be built
+FALLBACK_QSS = """
+    QWidget {
+        background-color: #1a1a1a;
+        color: white;
+        font-family: 'Segoe UI';
+    }
+    QPushButton {
+        background-color: #00CFFF;
+        color: white;
+        border: none;
+        border-radius: 6px;
+        padding: 8px;
+        font-weight: bold;
+    }
+    QPushButton:hover {
+        background-color: #0099CC;
+    }
+    QLineEdit, QTextEdit {
+        background-color: #2a2a2a;
+        border: 1px solid #00CFFF;
+        border-radius: 6px;
+        padding: 8px;
+        color: white;
+    }
+    QLineEdit[state="error"] {
+        border-color: #ff4444;
+    }
+    QListView {
+        background-color: #2a2a2a;
+        border: 1px solid #00CFFF;
+        border-radius: 6px;
+    }
+    QListView::item {
+        padding: 8px;
+        border-bottom: 1px solid #333;
+    }
+    QListView::item:selected {
+        background-color: #00CFFF;
+        color: white;
+    }
+"""
+
+_qss_cache = {}
+_applied_theme = None
+
+@traced("generate_qss")
 def generate_qss(theme_name="cyber_blue"):
+    """QSS stylesheet for the given theme, built on first use and then cached"""
+    qss = _qss_cache.get(theme_name)
+    if qss is None:
+        qss = _qss_cache[theme_name] = _build_qss(theme_name)
+    return qss
+
+def apply_app_theme(theme_name):
+    """Style the whole application with a theme, once per change"""
+    global _applied_theme
+    if theme_name == _applied_theme:
+        return False
+    try:
+        qss = generate_qss(theme_name)
+    except Exception as e:
+        print(f"Theme error: {e}")
+        qss = FALLBACK_QSS
+    QApplication.instance().setStyleSheet(qss)
+    _applied_theme = theme_name
+    return True
+
+def set_state(widget, state):
+    """Switch a widget between "error", "success" and normal ("") looks
+
+    Only the widget itself is re-polished, the rest of the tree keeps its style.
+    """
+    if (widget.property("state") or "") == state:
+        return
+    widget.setProperty("state", state)
+    widget.style().unpolish(widget)
+    widget.style().polish(widget)
+
+def _build_qss(theme_name):
     """Generate QSS stylesheet for the given theme"""
     theme = THEMES.get(theme_name, THEMES["cyber_blue"])
     
@@ -201,14 +286,14 @@ def generate_qss(theme_name="cyber_blue"):
     }}
     
     /* List Widgets */
-    QListWidget {{
+    QListView {{
         background-color: {theme['surface']};
         border: 2px solid {theme['primary']};
         border-radius: 8px;
         padding: 5px;
     }}
     
-    QListWidget::item {{
+    QListView::item {{
         background-color: {theme['card']};
         border: 1px solid {theme['primary']};
         border-radius: 6px;
@@ -217,12 +302,12 @@ def generate_qss(theme_name="cyber_blue"):
         color: {theme['text']};
     }}
     
-    QListWidget::item:selected {{
+    QListView::item:selected {{
         background-color: {theme['primary']};
         color: {theme['background']};
     }}
     
-    QListWidget::item:hover {{
+    QListView::item:hover {{
         background-color: {theme['accent']};
         color: {theme['background']};
     }}
@@ -310,8 +395,16 @@ def generate_qss(theme_name="cyber_blue"):
         background-color: {theme['surface']} !important;
     }}
     
+    QLineEdit[state="error"], QTextEdit[state="error"] {{
+        border-color: {theme['error']};
+    }}
+    
     /* Success Styling */
-    QLabel#SuccessLabel {{
+    QLineEdit[state="success"] {{
+        border-color: {theme['success']};
+    }}
+    
+    QLabel[state="success"], QLabel#SuccessLabel {{
         color: {theme['success']};
         font-weight: bold;
     }}
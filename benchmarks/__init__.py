@@ -0,0 +1 @@
+# Benchmarks for Cryptex
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""
+Compare record codecs by stored size and write/read latency
+
+Write is compress + encrypt, read is decrypt + decompress, both per
+record and through the same KeyContext the vault uses.
+
+Run from the project root: python -m benchmarks.bench_compression
+"""
+import io
+import os
+import random
+import time
+from core.encryptor import (KeyContext, CIPHER_AES_GCM, SEGMENT_SIZE, CODECS,
+                            CODEC_NONE, CODEC_ZLIB, CODEC_LZMA,
+                            compress_payload, decompress_payload)
+from core.database import RECORD_PUT, frame_header
+
+RECORD_SIZES = (128, 1024, 16 * 1024, 256 * 1024, 4 * 1024 * 1024)
+ROUNDS = 5
+WORDS = ("the", "vault", "note", "secure", "password", "meeting", "todo",
+         "remember", "server", "backup", "key", "project", "idea", "and", "of")
+
+def make_text(size, seed=0):
+    """Note-like text: words from a small vocabulary in short lines"""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        line = " ".join(rng.choices(WORDS, k=rng.randint(3, 12))) + "\n"
+        parts.append(line)
+        length += len(line)
+    return "".join(parts).encode()[:size]
+
+def fixed_codec(codec):
+    """Compressor that always uses one codec, to compare against adaptive"""
+    compress = CODECS[codec][0]
+    return lambda data: (codec, compress(data))
+
+STRATEGIES = (
+    ("none", fixed_codec(CODEC_NONE)),
+    ("zlib", fixed_codec(CODEC_ZLIB)),
+    ("lzma", fixed_codec(CODEC_LZMA)),
+    ("adaptive", compress_payload),
+)
+
+def bench(ctx, data, compress):
+    """Return (stored bytes, chosen codec, write ms, read ms) averaged over ROUNDS"""
+    write_time = read_time = 0.0
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        codec, payload = compress(data)
+        aad = frame_header(RECORD_PUT, codec, ctx.encrypted_size(len(payload)))
+        token = b"".join(ctx.encrypt_stream(payload, aad))
+        write_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        plain = b"".join(ctx.decrypt_stream(io.BytesIO(token).read, len(token), aad))
+        decompress_payload(codec, plain)
+        read_time += time.perf_counter() - start
+    return len(token), codec, write_time / ROUNDS * 1000, read_time / ROUNDS * 1000
+
+def main():
+    ctx = KeyContext(os.urandom(32), {"cipher": CIPHER_AES_GCM, "segment_size": SEGMENT_SIZE})
+    print(f"{'size KiB':>9} {'codec':<9} {'stored KiB':>11} {'ratio':>6} "
+          f"{'write ms':>9} {'read ms':>8}")
+    for size in RECORD_SIZES:
+        data = make_text(size)
+        for name, compress in STRATEGIES:
+            stored, codec, write_ms, read_ms = bench(ctx, data, compress)
+            if name == "adaptive":
+                name = f"auto:{codec}"
+            print(f"{size / 1024:>9.1f} {name:<9} {stored / 1024:>11.1f} "
+                  f"{stored / size:>6.2f} {write_ms:>9.2f} {read_ms:>8.2f}")
+
+if __name__ == "__main__":
+    main()
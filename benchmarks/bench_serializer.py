@@ -0,0 +1,52 @@
+"""
+Compare the binary record serializer against the old whole-vault JSON path
+
+Run from the project root: python -m benchmarks.bench_serializer
+"""
+import json
+import random
+import string
+import time
+from core.serializer import encode_record, decode_record
+
+NOTE_COUNTS = (1_000, 10_000, 100_000)
+
+def make_notes(count, seed=0):
+    """Generate notes with short titles and bodies of varying length"""
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits + " \n\"\\é"
+    notes = {}
+    for i in range(count):
+        body_len = int(rng.expovariate(1 / 400))
+        notes[f"Note {i}"] = "".join(rng.choices(alphabet, k=body_len))
+    return notes
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def bench_json(notes):
+    """Old path: one json.dumps of the whole vault"""
+    encoded, encode_time = timed(lambda: json.dumps(notes).encode())
+    _, decode_time = timed(lambda: json.loads(encoded))
+    return len(encoded), encode_time, decode_time
+
+def bench_binary(notes):
+    """New path: one binary record per note"""
+    records = [{"title": t, "content": c} for t, c in notes.items()]
+    encoded, encode_time = timed(lambda: [encode_record(r) for r in records])
+    _, decode_time = timed(lambda: [decode_record(e) for e in encoded])
+    return sum(len(e) for e in encoded), encode_time, decode_time
+
+def main():
+    print(f"{'notes':>8} {'format':<8} {'size KiB':>10} {'encode ms':>10} {'decode ms':>10}")
+    for count in NOTE_COUNTS:
+        notes = make_notes(count)
+        for name, bench in (("json", bench_json), ("binary", bench_binary)):
+            size, encode_time, decode_time = bench(notes)
+            print(f"{count:>8} {name:<8} {size / 1024:>10.1f} "
+                  f"{encode_time * 1000:>10.1f} {decode_time * 1000:>10.1f}")
+
+if __name__ == "__main__":
+    main()
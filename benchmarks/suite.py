@@ -0,0 +1,204 @@
+"""
+Core benchmark suite: vault, encryption and PIN operations on synthetic vaults
+
+Run from the project root:
+    python -m benchmarks.suite --notes 10,1000,100000 --json results.json
+    python -m benchmarks.suite --baseline results.json
+
+Each run happens in a scratch directory, so the real data/ is never touched.
+With --baseline, results more than --threshold worse than the baseline are
+flagged and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from benchmarks.synthetic import make_notes, make_vault, make_text, DEFAULT_PIN
+
+SECONDS = "s"
+THROUGHPUT = "MB/s"
+CRYPTO_SIZE = 4 * 1024 * 1024
+# Keep Argon2 fixed so auth timings compare across machines and settings
+BENCH_ARGON2 = {"time_cost": 2, "memory_cost": 64 * 1024, "parallelism": 1}
+
+def median_time(func, repeat):
+    """Median wall time of func() over repeat runs"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def bench_database(count, dist, mean_size, repeat):
+    """Unlock, load, save, delete, export and merge on a vault of count notes"""
+    from core.session import open_session
+    from core.database import load_data, save_data, delete_note, export_vault
+    from core.merge import merge_vault
+
+    results = {}
+    notes = make_notes(count, dist, mean_size)
+    make_vault(notes)
+
+    results["unlock"] = median_time(lambda: open_session(DEFAULT_PIN).close(), repeat)
+    session = open_session(DEFAULT_PIN)
+    results["load_all"] = median_time(
+        lambda: (session.cache.clear(), load_data(session)), repeat)
+
+    titles = list(notes)[:100]
+    body = make_text(random.Random(1), mean_size)
+    results["save"] = median_time(
+        lambda: [save_data(session, t, body) for t in titles], repeat) / max(len(titles), 1)
+    results["save_sync"] = median_time(
+        lambda: (save_data(session, titles[0], body), session.sync()), repeat)
+    results["delete"] = median_time(
+        lambda: [(delete_note(session, t), save_data(session, t, body)) for t in titles],
+        repeat) / max(len(titles), 1)
+    session.checkpoint()
+
+    results["export"] = median_time(lambda: export_vault(session, "export.enc"), repeat)
+
+    def merge():
+        # Every note is already in the vault: the streaming decrypt and
+        # content-hash dedupe of a full merge, without growing the vault
+        incoming = session.open_incoming("export.enc")
+        try:
+            merge_vault(session, incoming)
+        finally:
+            incoming.close()
+    results["merge"] = median_time(merge, repeat)
+    session.close()
+    return {name: (value, SECONDS) for name, value in results.items()}
+
+def bench_encryptor(repeat):
+    """Throughput of the record cipher and the cost of one key derivation"""
+    from core.encryptor import derive_key, new_kdf_params
+    from core.database import RECORD_PUT, frame_header
+
+    results = {}
+    ctx = derive_key(DEFAULT_PIN)
+    data = os.urandom(CRYPTO_SIZE)
+    aad = frame_header(RECORD_PUT, 0, ctx.encrypted_size(len(data)))
+    token = b"".join(ctx.encrypt_stream(data, aad))
+
+    def decrypt():
+        view = memoryview(token)
+        position = 0
+
+        def read(size):
+            nonlocal position
+            chunk = view[position:position + size]
+            position += size
+            return chunk
+        return b"".join(ctx.decrypt_stream(read, len(token), aad))
+
+    megabytes = CRYPTO_SIZE / (1024 * 1024)
+    encrypt_time = median_time(lambda: b"".join(ctx.encrypt_stream(data, aad)), repeat)
+    results["encrypt"] = (megabytes / encrypt_time, THROUGHPUT)
+    results["decrypt"] = (megabytes / median_time(decrypt, repeat), THROUGHPUT)
+    params = new_kdf_params(ctx.cipher_id)
+    results["derive_key"] = (median_time(lambda: derive_key(DEFAULT_PIN, params), repeat), SECONDS)
+    return results
+
+def bench_auth(repeat):
+    """set_pin and check_pin with fixed Argon2 parameters"""
+    from core import auth
+    from core.settings import settings
+
+    settings.settings["argon2_params"] = dict(
+        BENCH_ARGON2, budget_ms=settings.get("unlock_budget_ms", auth.DEFAULT_BUDGET_MS),
+        host=platform.node())
+    return {
+        "set_pin": (median_time(lambda: auth.set_pin(DEFAULT_PIN), repeat), SECONDS),
+        "check_pin": (median_time(lambda: auth.check_pin(DEFAULT_PIN), repeat), SECONDS),
+    }
+
+def run_suite(counts, dist, mean_size, repeat):
+    """Run every benchmark in a scratch directory, returns {name: (value, unit)}"""
+    results = {}
+    cwd = os.getcwd()
+    scratch = tempfile.mkdtemp(prefix="cryptex-bench-")
+    try:
+        os.chdir(scratch)
+        for count in counts:
+            for name, value in bench_database(count, dist, mean_size, repeat).items():
+                results[f"database.{name}[{count}]"] = value
+            shutil.rmtree("data")
+        for name, value in bench_encryptor(repeat).items():
+            results[f"encryptor.{name}"] = value
+        for name, value in bench_auth(repeat).items():
+            results[f"auth.{name}"] = value
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+    return results
+
+def compare(results, baseline, threshold):
+    """Names of results more than threshold worse than the baseline"""
+    regressions = []
+    for name, entry in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        value, base_value = entry["value"], base["value"]
+        if entry["unit"] == THROUGHPUT:
+            worse = value < base_value / (1 + threshold)
+        else:
+            worse = value > base_value * (1 + threshold)
+        if worse:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark core Cryptex operations")
+    parser.add_argument("--notes", default="10,1000,10000",
+                        help="comma separated vault sizes, up to 100000")
+    parser.add_argument("--dist", choices=("fixed", "uniform", "exp", "lognormal"), default="exp")
+    parser.add_argument("--mean-size", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare against a results file")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown before a result counts as a regression")
+    args = parser.parse_args()
+
+    counts = [int(count) for count in args.notes.split(",")]
+    raw = run_suite(counts, args.dist, args.mean_size, args.repeat)
+    results = {name: {"value": value, "unit": unit} for name, (value, unit) in raw.items()}
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.threshold) if baseline else []
+
+    print(f"{'benchmark':<32} {'value':>12} {'unit':<5} {'baseline':>12}")
+    for name, entry in results.items():
+        base = baseline.get(name, {}).get("value") if baseline else None
+        flag = "  REGRESSION" if name in regressions else ""
+        base_text = f"{base:>12.5g}" if base is not None else f"{'-':>12}"
+        print(f"{name:<32} {entry['value']:>12.5g} {entry['unit']:<5} {base_text}{flag}")
+
+    if args.json:
+        report = {
+            "meta": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "notes": counts, "dist": args.dist, "mean_size": args.mean_size,
+                "repeat": args.repeat, "time": int(time.time()),
+            },
+            "results": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
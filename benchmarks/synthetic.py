@@ -0,0 +1,70 @@
+"""
+Synthetic vault generator for benchmarks
+
+python -m benchmarks.synthetic DIR --notes 10000 --dist lognormal --mean-size 800
+writes DIR/data/vault.enc unlocked by PIN 0000.
+"""
+import argparse
+import os
+import random
+from core.encryptor import derive_key
+from core.database import write_vault
+
+WORDS = ("the", "vault", "note", "secure", "password", "meeting", "todo",
+         "remember", "server", "backup", "key", "project", "idea", "and", "of",
+         "é", "naïve", "2024", "http://example.com", "user@example.com")
+
+DEFAULT_PIN = "0000"
+
+def body_size(rng, dist, mean):
+    """Draw one note length in characters from a size distribution"""
+    if dist == "fixed":
+        return mean
+    if dist == "uniform":
+        return rng.randint(0, 2 * mean)
+    if dist == "exp":
+        return int(rng.expovariate(1 / mean)) if mean else 0
+    if dist == "lognormal":
+        # sigma 1: most notes short, a long tail of big ones, same mean
+        return int(rng.lognormvariate(0, 1) * mean / 1.6487)
+    raise ValueError(f"Unknown size distribution: {dist}")
+
+def make_text(rng, size):
+    """Note-like text of about size characters"""
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size]
+
+def make_notes(count, dist="exp", mean_size=400, seed=0):
+    """Generate count notes with bodies drawn from dist around mean_size"""
+    rng = random.Random(seed)
+    return {f"Note {i:06d}": make_text(rng, body_size(rng, dist, mean_size))
+            for i in range(count)}
+
+def make_vault(notes, pin=DEFAULT_PIN):
+    """Write notes as a fresh vault under data/ in the working directory"""
+    ctx = derive_key(pin)
+    write_vault(ctx, notes)
+    return ctx
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic Cryptex vault")
+    parser.add_argument("directory")
+    parser.add_argument("--notes", type=int, default=1000)
+    parser.add_argument("--dist", choices=("fixed", "uniform", "exp", "lognormal"), default="exp")
+    parser.add_argument("--mean-size", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pin", default=DEFAULT_PIN)
+    args = parser.parse_args()
+
+    os.makedirs(args.directory, exist_ok=True)
+    os.chdir(args.directory)
+    make_vault(make_notes(args.notes, args.dist, args.mean_size, args.seed), args.pin)
+    print(f"Wrote {args.notes} notes to {os.path.abspath('data/vault.enc')}")
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,109 @@
 import os
-from argon2 import PasswordHasher
+import platform
+import threading
+import time
+from core.settings import settings
+from core.trace import traced
 
 PIN_FILE = "data/pin.hash"
 
+# Calibration bounds: never weaker than 19 MiB / 2 passes (OWASP minimum
+# for Argon2id), never more than 1 GiB or 10 passes
+MIN_MEMORY_KIB = 19 * 1024
+MAX_MEMORY_KIB = 1024 * 1024
+START_MEMORY_KIB = 32 * 1024
+MIN_TIME_COST = 2
+MAX_TIME_COST = 10
+MAX_PARALLELISM = 4
+DEFAULT_BUDGET_MS = 500
+
+def _password_hasher(**params):
+    """argon2 is imported on first use, it is not needed to draw the login window"""
+    from argon2 import PasswordHasher
+    return PasswordHasher(**params)
+
+def _measure(time_cost, memory_cost, parallelism):
+    """Seconds one Argon2id hash takes with these parameters"""
+    hasher = _password_hasher(time_cost=time_cost, memory_cost=memory_cost,
+                              parallelism=parallelism)
+    start = time.perf_counter()
+    hasher.hash("calibration")
+    return time.perf_counter() - start
+
+def calibrate(budget_ms=DEFAULT_BUDGET_MS):
+    """Pick Argon2id parameters that take about budget_ms on this machine
+
+    Uses every core up to MAX_PARALLELISM, then the most memory that fits
+    in the budget, then as many passes as the remaining budget allows.
+    """
+    budget = budget_ms / 1000
+    parallelism = max(1, min(os.cpu_count() or 1, MAX_PARALLELISM))
+
+    memory_cost = START_MEMORY_KIB
+    elapsed = _measure(1, memory_cost, parallelism)
+    while memory_cost * 2 <= MAX_MEMORY_KIB and elapsed * 2 * MIN_TIME_COST <= budget:
+        memory_cost *= 2
+        elapsed = _measure(1, memory_cost, parallelism)
+    while memory_cost // 2 >= MIN_MEMORY_KIB and elapsed * MIN_TIME_COST > budget:
+        memory_cost //= 2
+        elapsed = _measure(1, memory_cost, parallelism)
+
+    time_cost = int(budget / max(elapsed, 1e-6))
+    time_cost = max(MIN_TIME_COST, min(time_cost, MAX_TIME_COST))
+    return {"time_cost": time_cost, "memory_cost": memory_cost,
+            "parallelism": parallelism}
+
+_calibrating = threading.Lock()
+
+def _tuned_params():
+    """Calibrated parameters if they match this host and budget, else None"""
+    params = settings.get("argon2_params")
+    if (not params or params.get("budget_ms") != settings.get("unlock_budget_ms", DEFAULT_BUDGET_MS)
+            or params.get("host") != platform.node()):
+        return None
+    return params
+
+def _recalibrate():
+    """Calibrate for this host and budget and keep the result in settings"""
+    with _calibrating:
+        params = _tuned_params()
+        if params is None:
+            budget_ms = settings.get("unlock_budget_ms", DEFAULT_BUDGET_MS)
+            params = dict(calibrate(budget_ms), budget_ms=budget_ms, host=platform.node())
+            settings.set("argon2_params", params)
+        return params
+
+def _recalibrate_in_background():
+    def run():
+        try:
+            _recalibrate()
+        except Exception as e:
+            print(f"Argon2 calibration error: {e}")
+    threading.Thread(target=run, name="argon2-calibrate", daemon=True).start()
+
+def get_hasher():
+    """PasswordHasher tuned for this host, calibrating on first use
+
+    The result is kept in settings next to the budget and host it was
+    measured for, so it is redone only when either changes.
+    """
+    params = _tuned_params() or _recalibrate()
+    return _password_hasher(time_cost=params["time_cost"],
+                            memory_cost=params["memory_cost"],
+                            parallelism=params["parallelism"])
+
+def _write_hash(hashed):
+    """Replace the stored hash atomically"""
+    os.makedirs("data", exist_ok=True)
+    tmp = PIN_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        f.write(hashed)
+    os.replace(tmp, PIN_FILE)
+
 def set_pin(pin):
     """Set a new PIN"""
     try:
-        os.makedirs("data", exist_ok=True)
-        hasher = PasswordHasher()
-        hashed = hasher.hash(pin)
-        with open(PIN_FILE, "w") as f:
-            f.write(hashed)
+        _write_hash(get_hasher().hash(pin))
         return True
     except Exception as e:
         print(f"Error setting PIN: {e}")
@@ -20,18 +113,53 @@ def pin_exists():
     """Check if a PIN has been set"""
     return os.path.exists(PIN_FILE)
 
+@traced("check_pin")
 def check_pin(pin):
     """Check if the provided PIN is correct"""
     try:
         if not pin_exists():
             return False
-        
+
         with open(PIN_FILE, "r") as f:
             stored = f.read().strip()
-        
-        hasher = PasswordHasher()
+
+        # verify() reads the parameters from the stored hash itself
+        hasher = _password_hasher()
         hasher.verify(stored, pin)
-        return True
     except Exception as e:
         print(f"Error checking PIN: {e}")
-        return False
\ No newline at end of file
+        return False
+
+    try:
+        # Upgrade hashes made with weaker parameters. Calibrating can take
+        # seconds, so a host or budget change is measured off the unlock
+        # path and the upgrade waits for the next unlock.
+        params = _tuned_params()
+        if params is None:
+            _recalibrate_in_background()
+        elif _stronger(params, stored):
+            _write_hash(get_hasher().hash(pin))
+    except Exception as e:
+        print(f"Error upgrading PIN hash: {e}")
+    return True
+
+def _stronger(params, stored):
+    """Whether params cost an attacker more per guess than the stored hash
+
+    Cost is memory times passes; parallelism is left out since it does
+    not make a guess any dearer, only faster on more cores. Params below
+    the OWASP floor never count, and a vault carried to a slower host
+    must not have its hash weakened.
+    """
+    from argon2 import extract_parameters
+    current = extract_parameters(stored)
+    if params["memory_cost"] < MIN_MEMORY_KIB or params["time_cost"] < MIN_TIME_COST:
+        return False
+    return (params["memory_cost"] * params["time_cost"]
+            > current.memory_cost * current.time_cost)
+
+if __name__ == "__main__":
+    budget = settings.get("unlock_budget_ms", DEFAULT_BUDGET_MS)
+    params = calibrate(budget)
+    print(f"budget {budget} ms: {params}, "
+          f"measured {_measure(**params) * 1000:.0f} ms")
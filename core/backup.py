@@ -0,0 +1,201 @@
+"""Deduplicated incremental vault backups for Cryptex
+
+A snapshot splits the vault into chunks and stores each chunk once under
+its SHA-256, next to a manifest listing the chunks in order. Chunks are
+cut on record frame boundaries chosen from the frame contents, so
+appends, deletes and compaction leave the other chunks byte-identical
+and a new snapshot only stores what changed. Frames are already
+encrypted, so chunks are stored as they are.
+"""
+import hashlib
+import json
+import os
+import time
+from core.database import DB_FILE, vault_spans
+
+BACKUP_DIR = "data/backups"
+CHUNK_DIR = os.path.join(BACKUP_DIR, "chunks")
+MANIFEST_DIR = os.path.join(BACKUP_DIR, "manifests")
+REFCOUNT_FILE = os.path.join(BACKUP_DIR, "refcounts.json")
+
+# A chunk ends after a frame whose last bytes hit the boundary mask, once
+# it holds MIN_CHUNK_SIZE; frames are cut anyway at MAX_CHUNK_SIZE
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+BOUNDARY_MASK = 0x7  # about one frame in eight ends a chunk
+
+DEFAULT_KEEP = 30
+
+
+def _atomic_write(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _chunk_path(digest):
+    return os.path.join(CHUNK_DIR, digest[:2], digest)
+
+
+def _is_boundary(frame_tail):
+    """Content-defined cut point, taken from a frame's trailing (tag) bytes"""
+    return int.from_bytes(frame_tail[-4:], "big") & BOUNDARY_MASK == 0
+
+
+def iter_chunks(f):
+    """Yield the vault's bytes as content-defined chunks"""
+    spans = list(vault_spans(f))
+    pending = []
+    size = 0
+    for index, (offset, length) in enumerate(spans):
+        f.seek(offset)
+        if length > MAX_CHUNK_SIZE:
+            # A huge frame is cut at fixed offsets of its own, which stay
+            # put because frames are never rewritten
+            if pending:
+                yield b"".join(pending)
+                pending, size = [], 0
+            while length > 0:
+                piece = f.read(min(length, MAX_CHUNK_SIZE))
+                length -= len(piece)
+                yield piece
+            continue
+        frame = f.read(length)
+        pending.append(frame)
+        size += length
+        # The header always ends a chunk so appended frames never shift it
+        if index == 0 or size >= MAX_CHUNK_SIZE or (
+                size >= MIN_CHUNK_SIZE and _is_boundary(frame)):
+            yield b"".join(pending)
+            pending, size = [], 0
+    if pending:
+        yield b"".join(pending)
+
+
+def _count_references(names):
+    """Chunk reference counts of the given snapshots, from their manifests"""
+    refcounts = {}
+    for name in names:
+        for digest in load_manifest(name)["chunks"]:
+            refcounts[digest] = refcounts.get(digest, 0) + 1
+    return refcounts
+
+
+def _load_refcounts():
+    """Chunk reference counts, rebuilt from the manifests if missing"""
+    if os.path.exists(REFCOUNT_FILE):
+        try:
+            with open(REFCOUNT_FILE) as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Rebuilding backup reference counts: {e}")
+    return _count_references(list_backups())
+
+
+def list_backups():
+    """Snapshot names, oldest first"""
+    if not os.path.isdir(MANIFEST_DIR):
+        return []
+    return sorted(name[:-5] for name in os.listdir(MANIFEST_DIR) if name.endswith(".json"))
+
+
+def load_manifest(name):
+    with open(os.path.join(MANIFEST_DIR, name + ".json")) as f:
+        return json.load(f)
+
+
+def create_backup(path=DB_FILE):
+    """Snapshot the vault, storing only chunks not already backed up
+
+    Returns (snapshot name, bytes written), or (None, 0) when the vault
+    is missing or unchanged since the last snapshot.
+    """
+    if not os.path.exists(path):
+        return None, 0
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    refcounts = _load_refcounts()
+    chunks = []
+    written = 0
+    total = 0
+    # Appends past the size seen on open and torn frames are left out, and
+    # a compaction swap keeps this handle on the old file, so no lock
+    with open(path, "rb") as f:
+        for chunk in iter_chunks(f):
+            digest = hashlib.sha256(chunk).hexdigest()
+            chunks.append(digest)
+            total += len(chunk)
+            target = _chunk_path(digest)
+            if not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                _atomic_write(target, chunk)
+                written += len(chunk)
+
+    backups = list_backups()
+    if backups and load_manifest(backups[-1])["chunks"] == chunks:
+        return None, 0
+
+    name = time.strftime("%Y%m%d-%H%M%S")
+    if backups and backups[-1] >= name:
+        name = f"{backups[-1]}-1"
+    manifest = {"created": int(time.time()), "size": total, "chunks": chunks}
+    # Counts first: a crash in between over-counts, which only keeps a
+    # chunk around longer, never under-counts
+    for digest in chunks:
+        refcounts[digest] = refcounts.get(digest, 0) + 1
+    _atomic_write(REFCOUNT_FILE, json.dumps(refcounts).encode())
+    _atomic_write(os.path.join(MANIFEST_DIR, name + ".json"), json.dumps(manifest).encode())
+    return name, written
+
+
+def prune_backups(keep=DEFAULT_KEEP):
+    """Drop all but the newest keep snapshots and chunks nobody references
+
+    The counts are rebuilt from the manifests that stay rather than taken
+    from the stored file, which a crash can leave behind the manifests, so
+    a chunk a remaining snapshot lists is never deleted.
+    """
+    backups = list_backups()
+    if len(backups) <= keep:
+        return 0
+    dropped, kept = backups[:len(backups) - keep], backups[len(backups) - keep:]
+    refcounts = _count_references(kept)
+    # Manifests go first, a crash then leaves unreferenced chunks at worst
+    doomed = set()
+    for name in dropped:
+        doomed.update(load_manifest(name)["chunks"])
+        os.remove(os.path.join(MANIFEST_DIR, name + ".json"))
+    _atomic_write(REFCOUNT_FILE, json.dumps(refcounts).encode())
+    for digest in doomed - refcounts.keys():
+        chunk_path = _chunk_path(digest)
+        if os.path.exists(chunk_path):
+            os.remove(chunk_path)
+    return len(dropped)
+
+
+def restore_backup(name, path):
+    """Reassemble a snapshot into a vault file at path"""
+    manifest = load_manifest(name)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as out:
+        for digest in manifest["chunks"]:
+            with open(_chunk_path(digest), "rb") as f:
+                data = f.read()
+            if hashlib.sha256(data).hexdigest() != digest:
+                raise ValueError(f"Backup chunk {digest} is damaged")
+            out.write(data)
+    os.replace(tmp, path)
+    return manifest["size"]
+
+
+def backup_vault(keep=DEFAULT_KEEP):
+    """Snapshot the vault and apply retention, returns True on success"""
+    try:
+        create_backup()
+        prune_backups(keep)
+        return True
+    except Exception as e:
+        print(f"Error backing up vault: {e}")
+        return False
@@ -1,80 +1,554 @@
 import os
 import json
+import mmap
 import shutil
-from core.encryptor import encrypt, decrypt
+import struct
+import threading
+import weakref
+from core.encryptor import CODECS, compress_payload, decompress_payload, decrypt
+from core.serializer import encode_record, decode_record, encode_index, decode_index
+from core.trace import trace, traced
 
 DB_FILE = "data/vault.enc"
 
-def load_data(pin):
-    """Load encrypted data from vault"""
+# The vault is an append-only log: a magic header followed by records.
+# Every record is encrypted on its own, so a save appends one record
+# instead of rewriting the whole vault. Deletes append a tombstone.
+# The log doubles as the write-ahead journal: appends are fsync'd in
+# batches, unlock replays every complete record after the last index
+# block, and full rewrites land through an fsync'd atomic rename.
+# The header carries the KDF parameters (salt, cost) used for the key.
+VAULT_MAGIC = b"CRYPTEX\x02"
+HEADER_LENGTH = struct.Struct(">H")
+RECORD_HEADER = struct.Struct(">BI")  # frame type, payload length
+# The frame type byte holds the record type in its low bits and the
+# compression codec in its high bits; codec 0 is uncompressed.
+RECORD_TYPE_MASK = 0x0F
+CODEC_SHIFT = 4
+
+FORMAT_BLOB = 0  # one Fernet token of JSON, unsalted SHA-256 key
+FORMAT_LOG = 2   # record log, salted KDF key
+
+RECORD_PUT = 1
+RECORD_DELETE = 2
+# Separately encrypted title -> (offset, length, modified, size) block.
+# Unlock decrypts the latest one and only replays records written after it.
+RECORD_INDEX = 3
+RECORD_TYPES = (RECORD_PUT, RECORD_DELETE, RECORD_INDEX)
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Read ahead of unlock: the header and the end of the log, where the latest
+# index block and the records replayed after it are
+PREFETCH_HEAD_BYTES = 64 * 1024
+PREFETCH_TAIL_BYTES = 8 * 1024 * 1024
+
+# Appends are made durable in batches (group commit): the session fsyncs
+# once its write queue drains or this many records are unsynced
+SYNC_BATCH_RECORDS = 64
+
+# Compact once dead records take up this share of the file
+COMPACT_RATIO = 0.5
+COMPACT_MIN_BYTES = 64 * 1024
+
+# Guards the vault file itself; sessions keep their own lock for the index
+_lock = threading.RLock()
+# Open memory maps must be dropped before the vault file is replaced
+_readers = weakref.WeakSet()
+
+
+def new_stats():
+    """Size accounting for a log: header, latest index block, live records"""
+    return {"header_bytes": 0, "index_bytes": 0, "live_bytes": 0, "total_bytes": 0}
+
+
+def dead_bytes(stats):
+    """Bytes taken by superseded records, tombstones and stale index blocks"""
+    return (stats["total_bytes"] - stats["header_bytes"]
+            - stats["index_bytes"] - stats["live_bytes"])
+
+
+def needs_compaction(stats):
+    """Check whether dead records have passed the compaction threshold"""
+    total = stats["total_bytes"]
+    return total >= COMPACT_MIN_BYTES and dead_bytes(stats) >= total * COMPACT_RATIO
+
+
+def frame_type(rtype, codec):
+    """Pack a record type and its codec into a frame type byte"""
+    return rtype | codec << CODEC_SHIFT
+
+
+def split_frame_type(ftype):
+    """Unpack a frame type byte into (record type, codec)"""
+    return ftype & RECORD_TYPE_MASK, ftype >> CODEC_SHIFT
+
+
+def iter_frames(f, end):
+    """Yield (offset, record type, codec, payload length) for each complete frame
+
+    Payloads are skipped, so walking the log reads only frame headers.
+    Walking stops at the first header that cannot start a frame.
+    """
+    while f.tell() + RECORD_HEADER.size <= end:
+        offset = f.tell()
+        ftype, length = RECORD_HEADER.unpack(f.read(RECORD_HEADER.size))
+        rtype, codec = split_frame_type(ftype)
+        if rtype == 0 or codec not in CODECS or length == 0:
+            # Never-written tail, some filesystems leave zeros after a crash
+            break
+        if offset + RECORD_HEADER.size + length > end:
+            # Torn write at the end of the log, ignore it
+            break
+        yield offset, rtype, codec, length
+        f.seek(offset + RECORD_HEADER.size + length)
+
+
+def frame_header(rtype, codec, length):
+    """Frame header bytes, also the associated data of the frame's payload"""
+    return RECORD_HEADER.pack(frame_type(rtype, codec), length)
+
+
+def read_payload(ctx, read, rtype, codec, length):
+    """Decrypt a payload segment by segment as read() hands it over, then decompress"""
+    aad = frame_header(rtype, codec, length)
+    with trace("decrypt", length):
+        return decompress_payload(codec, b"".join(ctx.decrypt_stream(read, length, aad)))
+
+
+def _slice_reader(view):
+    """read() over a memoryview that hands out zero-copy slices"""
+    position = 0
+
+    def read(size):
+        nonlocal position
+        chunk = view[position:position + size]
+        position += size
+        return chunk
+    return read
+
+
+def _release_maps():
+    """Close every open memory map of the vault before it is replaced"""
+    for reader in list(_readers):
+        reader.close()
+
+
+def write_frame(ctx, f, rtype, plaintext, codec=None):
+    """Compress and encrypt a payload into a log frame, returns its size
+
+    A payload that is already compressed comes with the codec it used.
+    """
+    if codec is None:
+        codec, plaintext = compress_payload(plaintext)
+    length = ctx.encrypted_size(len(plaintext))
+    header = frame_header(rtype, codec, length)
+    with trace("encrypt", length):
+        f.write(header)
+        for segment in ctx.encrypt_stream(plaintext, header):
+            f.write(segment)
+    return RECORD_HEADER.size + length
+
+
+def _copy_range(src, dst, offset, size):
+    """Copy size bytes from offset in src to dst in bounded chunks"""
+    src.seek(offset)
+    while size > 0:
+        chunk = src.read(min(size, COPY_CHUNK_SIZE))
+        if not chunk:
+            break
+        dst.write(chunk)
+        size -= len(chunk)
+
+
+def _fsync_dir(path):
+    """Persist a rename in the directory holding path, where supported"""
+    if os.name != "posix":
+        return
+    fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def replace_durably(tmp, path):
+    """Flush tmp to disk and atomically rename it over path
+
+    A crash leaves either the old file or the complete new one, never a
+    mix of both.
+    """
+    with open(tmp, "rb+") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(path)
+
+
+def sync_vault(path=DB_FILE):
+    """Flush every record appended so far to disk with a single fsync"""
+    with _lock:
+        if os.path.exists(path):
+            with open(path, "rb+") as f:
+                os.fsync(f.fileno())
+
+
+def _header_bytes(params):
+    """Serialize the vault header"""
+    header = json.dumps(params).encode()
+    return VAULT_MAGIC + HEADER_LENGTH.pack(len(header)) + header
+
+
+def _read_header(f):
+    """Read the vault header, returns (format, KDF params) and leaves f after it"""
+    f.seek(0)
+    magic = f.read(len(VAULT_MAGIC))
+    if magic == VAULT_MAGIC:
+        try:
+            (length,) = HEADER_LENGTH.unpack(f.read(HEADER_LENGTH.size))
+            return FORMAT_LOG, json.loads(f.read(length))
+        except (struct.error, ValueError):
+            raise ValueError("Not a Cryptex vault") from None
+    f.seek(0)
+    return FORMAT_BLOB, None
+
+
+def _apply(index, stats, offset, size, rtype, record):
+    """Apply a PUT or DELETE record to an index and its size accounting"""
+    old = index.pop(record["title"], None)
+    if old is not None:
+        stats["live_bytes"] -= old["length"]
+    if rtype == RECORD_PUT:
+        index[record["title"]] = {
+            "offset": offset,
+            "length": size,
+            "modified": record.get("modified", 0),
+            "size": len(record["content"]),
+        }
+        stats["live_bytes"] += size
+
+
+def vault_header(path=DB_FILE):
+    """Return (format, KDF params) of a vault, format is None if it is empty"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None, None
+    with _lock, open(path, "rb") as f:
+        return _read_header(f)
+
+
+def prefetch_vault(path=DB_FILE):
+    """Pull the parts of the vault unlock reads into the OS cache
+
+    Unlock needs the header, the latest index block and the records after
+    it, which sit at the start and the end of the log. Only those are
+    read, so a large vault on slow storage is not read whole.
+    """
+    if not os.path.exists(path):
+        return 0
+    size = os.path.getsize(path)
+    total = 0
+    with open(path, "rb") as f:
+        total += len(f.read(min(size, PREFETCH_HEAD_BYTES)))
+        start = max(PREFETCH_HEAD_BYTES, size - PREFETCH_TAIL_BYTES)
+        f.seek(start)
+        while True:
+            chunk = f.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                return total
+            total += len(chunk)
+
+
+def vault_spans(f):
+    """Yield (offset, size) of the header and then of every complete frame
+
+    Works on the raw, still encrypted file; a legacy single-blob vault
+    comes out as one span.
+    """
+    end = os.fstat(f.fileno()).st_size
+    fmt, _ = _read_header(f)
+    if fmt == FORMAT_BLOB:
+        if end:
+            yield 0, end
+        return
+    yield 0, f.tell()
+    for offset, _, _, length in iter_frames(f, end):
+        yield offset, RECORD_HEADER.size + length
+
+
+def read_legacy_vault(pin, path=DB_FILE):
+    """Decrypt every note of a single-blob vault from before the record log"""
+    with _lock, open(path, "rb") as f:
+        encrypted = f.read()
+    return json.loads(decrypt(pin, encrypted)) if encrypted else {}
+
+
+def read_index(ctx, path=DB_FILE, repair=True):
+    """Load the note index of a log vault, returns (index, stats, replayed)
+
+    Only the latest index block and the records appended after it are
+    decrypted; replayed counts those records. Whatever a crash left at
+    the end of the log (a torn or zero-filled frame, or one whose payload
+    never reached the disk and fails to authenticate) is cut off so later
+    appends stay readable, unless repair is off and the file is only read.
+    Nothing is cut unless some frame authenticated, so a wrong key raises
+    instead of emptying the vault.
+    """
+    index = {}
+    stats = new_stats()
+    with _lock, open(path, "r+b" if repair else "rb") as f:
+        _read_header(f)
+        stats["header_bytes"] = f.tell()
+        file_size = os.fstat(f.fileno()).st_size
+
+        index_blocks = []
+        valid_end = f.tell()
+        for offset, rtype, codec, length in iter_frames(f, file_size):
+            if rtype not in RECORD_TYPES:
+                break
+            valid_end = offset + RECORD_HEADER.size + length
+            if rtype == RECORD_INDEX:
+                index_blocks.append((offset, codec, length))
+
+        authenticated = False
+        failure = None
+        replay_from = stats["header_bytes"]
+        while index_blocks:
+            offset, codec, length = index_blocks.pop()
+            f.seek(offset + RECORD_HEADER.size)
+            try:
+                index = decode_index(read_payload(ctx, f.read, RECORD_INDEX, codec, length))
+            except Exception as e:
+                # An index block that never fully reached the disk: drop it
+                # and everything after it, the previous block still holds
+                failure = e
+                valid_end = offset
+                continue
+            authenticated = True
+            replay_from = offset + RECORD_HEADER.size + length
+            stats["index_bytes"] = RECORD_HEADER.size + length
+            stats["live_bytes"] = sum(entry["length"] for entry in index.values())
+            break
+
+        f.seek(replay_from)
+        replayed = 0
+        for offset, rtype, codec, length in iter_frames(f, valid_end):
+            try:
+                record = decode_record(read_payload(ctx, f.read, rtype, codec, length))
+            except Exception as e:
+                # Appended but never flushed, replay stops at the first such frame
+                failure = e
+                valid_end = offset
+                break
+            authenticated = True
+            _apply(index, stats, offset, RECORD_HEADER.size + length, rtype, record)
+            replayed += 1
+
+        if valid_end < file_size:
+            if failure is not None and not authenticated:
+                raise failure
+            if repair:
+                if failure is not None:
+                    print(f"Dropping {file_size - valid_end} bytes of unreadable vault log: {failure!r}")
+                _release_maps()
+                f.truncate(valid_end)
+        stats["total_bytes"] = valid_end
+    return index, stats, replayed
+
+
+class VaultReader:
+    """Memory-mapped vault that decrypts single records on demand
+
+    Payloads are decrypted from memoryview slices of the map, so reading a
+    note never copies the file and only touches the pages it needs. The
+    map is reopened when the log grows past it or the file was replaced.
+    """
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self._file = None
+        self._map = None
+        _readers.add(self)
+
+    def _ensure(self, end):
+        """Make sure the map covers the file up to end"""
+        if self._map is not None and len(self._map) >= end:
+            return
+        self.close()
+        self._file = open(self.path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < end:
+            raise ValueError("Record lies outside the vault file")
+
+    def read_record(self, ctx, entry):
+        """Decrypt the record an index entry points at"""
+        with _lock:
+            offset = entry["offset"]
+            start = offset + RECORD_HEADER.size
+            self._ensure(start)
+            ftype, length = RECORD_HEADER.unpack_from(self._map, offset)
+            rtype, codec = split_frame_type(ftype)
+            self._ensure(start + length)
+            with memoryview(self._map) as view:
+                payload = view[start:start + length]
+                try:
+                    plaintext = read_payload(ctx, _slice_reader(payload), rtype, codec, length)
+                finally:
+                    payload.release()
+            return decode_record(plaintext)
+
+    def close(self):
+        """Unmap the vault, the next read maps it again"""
+        with _lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def write_vault(ctx, notes):
+    """Replace the vault with a fresh log and index, returns (index, stats)"""
+    os.makedirs("data", exist_ok=True)
+    header = _header_bytes(ctx.params)
+    index = {}
+    stats = new_stats()
+    stats["header_bytes"] = len(header)
+    tmp = DB_FILE + ".tmp"
+    with _lock:
+        with open(tmp, "wb") as f:
+            f.write(header)
+            for title, content in notes.items():
+                record = {"title": title, "content": content}
+                offset = f.tell()
+                size = write_frame(ctx, f, RECORD_PUT, encode_record(record))
+                _apply(index, stats, offset, size, RECORD_PUT, record)
+            stats["index_bytes"] = write_frame(ctx, f, RECORD_INDEX, encode_index(index))
+            stats["total_bytes"] = f.tell()
+        _release_maps()
+        replace_durably(tmp, DB_FILE)
+    return index, stats
+
+
+def append_record(ctx, rtype, record, index, stats):
+    """Append one record to the log and apply it to the index"""
+    os.makedirs("data", exist_ok=True)
+    # Compress outside the lock so other writers are not held up
+    codec, payload = compress_payload(encode_record(record))
+    with _lock:
+        with open(DB_FILE, "ab") as f:
+            if f.tell() == 0:
+                header = _header_bytes(ctx.params)
+                f.write(header)
+                index.clear()
+                stats.update(new_stats())
+                stats["header_bytes"] = len(header)
+            offset = f.tell()
+            size = write_frame(ctx, f, rtype, payload, codec)
+        stats["total_bytes"] = offset + size
+        _apply(index, stats, offset, size, rtype, record)
+
+
+def append_index(ctx, index, stats):
+    """Append a fresh index block so the next unlock can skip the replay"""
+    with _lock:
+        with open(DB_FILE, "ab") as f:
+            offset = f.tell()
+            size = write_frame(ctx, f, RECORD_INDEX, encode_index(index))
+        stats["index_bytes"] = size
+        stats["total_bytes"] = offset + size
+
+
+def compact(ctx, index, stats, index_lock):
+    """Rewrite the log keeping only live records, then append a new index
+
+    Live frames are copied without decrypting them. Saves may keep
+    appending while the copy runs; whatever they wrote is carried over
+    and the index offsets are remapped when the files are swapped.
+    index_lock is the lock that guards index and stats.
+    """
+    tmp = DB_FILE + ".compact"
+    try:
+        with index_lock, _lock:
+            if not os.path.exists(DB_FILE):
+                return False
+            snapshot_end = os.path.getsize(DB_FILE)
+            live = sorted((entry["offset"], entry["length"]) for entry in index.values())
+            with open(DB_FILE, "rb") as f:
+                if _read_header(f)[0] != FORMAT_LOG:
+                    return False
+                header_size = f.tell()
+                f.seek(0)
+                header = f.read(header_size)
+
+        moved = {}
+        with open(DB_FILE, "rb") as f, open(tmp, "wb") as out:
+            out.write(header)
+            for offset, size in live:
+                moved[offset] = out.tell()
+                _copy_range(f, out, offset, size)
+
+        with index_lock, _lock:
+            # Copy whatever was appended while we were busy, then swap
+            with open(DB_FILE, "rb") as f, open(tmp, "ab") as out:
+                shift = out.tell() - snapshot_end
+                f.seek(snapshot_end)
+                shutil.copyfileobj(f, out)
+            _release_maps()
+            replace_durably(tmp, DB_FILE)
+
+            for entry in index.values():
+                if entry["offset"] >= snapshot_end:
+                    entry["offset"] += shift
+                else:
+                    entry["offset"] = moved[entry["offset"]]
+            stats.update(new_stats())
+            stats["header_bytes"] = header_size
+            stats["live_bytes"] = sum(entry["length"] for entry in index.values())
+            append_index(ctx, index, stats)
+        return True
+    except Exception as e:
+        print(f"Error compacting vault: {e}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return False
+
+
+@traced("load_data")
+def load_data(session):
+    """Load every decrypted note from the open vault session"""
     try:
-        if not os.path.exists(DB_FILE):
-            return {}
-        
-        with open(DB_FILE, "rb") as f:
-            encrypted = f.read()
-        
-        if not encrypted:
-            return {}
-        
-        decrypted = decrypt(pin, encrypted)
-        return json.loads(decrypted)
+        return {title: session.get(title) for title in session.titles()}
     except Exception as e:
         print(f"Error loading data: {e}")
         return {}
 
-def save_data(pin, title, content):
+@traced("save_data")
+def save_data(session, title, content):
     """Save encrypted data to vault"""
     try:
-        data = load_data(pin)
-        data[title] = content
-        
-        os.makedirs("data", exist_ok=True)
-        
-        with open(DB_FILE, "wb") as f:
-            f.write(encrypt(pin, json.dumps(data)))
-        
+        session.save(title, content)
         return True
     except Exception as e:
         print(f"Error saving data: {e}")
         return False
 
-def delete_note(pin, title):
+def delete_note(session, title):
     """Delete a note from the vault"""
     try:
-        data = load_data(pin)
-        if title in data:
-            del data[title]
-            
-            os.makedirs("data", exist_ok=True)
-            
-            with open(DB_FILE, "wb") as f:
-                f.write(encrypt(pin, json.dumps(data)))
-        
+        session.delete(title)
         return True
     except Exception as e:
         print(f"Error deleting note: {e}")
         return False
 
-def export_vault(path):
+def export_vault(session, path):
     """Export vault to specified path"""
     try:
-        if os.path.exists(DB_FILE):
-            shutil.copy(DB_FILE, path)
-            return True
+        with session.lock, _lock:
+            if os.path.exists(DB_FILE):
+                shutil.copy(DB_FILE, path)
+                return True
         return False
     except Exception as e:
         print(f"Error exporting vault: {e}")
         return False
-
-def import_vault(path):
-    """Import vault from specified path"""
-    try:
-        if os.path.exists(path):
-            os.makedirs("data", exist_ok=True)
-            shutil.copy(path, DB_FILE)
-            return True
-        return False
-    except Exception as e:
-        print(f"Error importing vault: {e}")
-        return False
\ No newline at end of file
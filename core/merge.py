@@ -0,0 +1,141 @@
+"""Merge another vault into the open one, note by note"""
+import hashlib
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import InvalidToken
+from core.encryptor import derive_key
+from core.database import (FORMAT_BLOB, vault_header, read_index, read_legacy_vault,
+                           VaultReader)
+
+POLICY_NEWEST = "newest"        # the copy modified last wins
+POLICY_KEEP_BOTH = "keep_both"  # keep ours, add theirs under a new title
+POLICY_SKIP = "skip"            # keep ours, drop theirs
+POLICIES = (POLICY_NEWEST, POLICY_KEEP_BOTH, POLICY_SKIP)
+
+# Every Fernet token starts with its version byte and a timestamp whose
+# top bits are zero, a single-blob vault that does not is no vault at all
+FERNET_TOKEN_PREFIX = b"gAAAAA"
+
+RENAME_SUFFIX = "imported"
+MAX_RENAMES = 100
+
+
+class WrongPinError(Exception):
+    """The PIN does not decrypt the vault being merged"""
+
+
+def content_hash(content):
+    return hashlib.sha256(content.encode()).digest()
+
+
+class IncomingVault:
+    """A vault file opened read-only for merging
+
+    Only its title index is held in memory; note bodies are decrypted one
+    at a time straight from the mapped file. Vaults from before the record
+    log are a single blob and are decrypted whole.
+    """
+
+    def __init__(self, path, pin):
+        self.path = path
+        self.ctx = None
+        self._reader = None
+        self._notes = None
+        self.index = {}
+        fmt, params = vault_header(path)
+        if fmt is None:
+            raise ValueError("The file is empty")
+        if fmt == FORMAT_BLOB:
+            with open(path, "rb") as f:
+                if f.read(len(FERNET_TOKEN_PREFIX)) != FERNET_TOKEN_PREFIX:
+                    raise ValueError("Not a Cryptex vault")
+        try:
+            if fmt == FORMAT_BLOB:
+                self._notes = read_legacy_vault(pin, path)
+            else:
+                self.ctx = derive_key(pin, params)
+                self.index, _, _ = read_index(self.ctx, path, repair=False)
+                self._reader = VaultReader(path)
+        except (InvalidTag, InvalidToken) as e:
+            # Only a failed authentication means the PIN is wrong
+            raise WrongPinError(f"Cannot decrypt {path} with this PIN") from e
+
+    def __len__(self):
+        return len(self._notes) if self._notes is not None else len(self.index)
+
+    def notes(self):
+        """Yield (title, content, modified) in file order, one note decrypted at a time"""
+        if self._notes is not None:
+            for title, content in self._notes.items():
+                yield title, content, 0
+            return
+        for title, entry in sorted(self.index.items(), key=lambda item: item[1]["offset"]):
+            record = self._reader.read_record(self.ctx, entry)
+            yield title, record["content"], entry["modified"]
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+
+
+def _free_title(session, title, digest):
+    """Title for a kept-both copy, or None if an earlier merge already added it"""
+    for n in range(1, MAX_RENAMES + 1):
+        candidate = f"{title} ({RENAME_SUFFIX})" if n == 1 else f"{title} ({RENAME_SUFFIX} {n})"
+        existing = session.get(candidate)
+        if existing is None:
+            return candidate
+        if content_hash(existing) == digest:
+            return None
+    raise ValueError(f"Too many copies of '{title}'")
+
+
+def merge_vault(session, incoming, policy=POLICY_NEWEST, progress=None, cancelled=None):
+    """Merge the notes of an IncomingVault into the session
+
+    Identical notes are skipped by content hash and title clashes are
+    settled by policy. progress(done, total) is called as notes go by
+    and cancelled() is checked before each one; a cancelled merge keeps
+    what it already wrote. Returns counts of what happened.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown merge policy: {policy}")
+    counts = {"added": 0, "updated": 0, "renamed": 0, "skipped": 0,
+              "duplicates": 0, "cancelled": False}
+    total = len(incoming)
+    for done, (title, content, modified) in enumerate(incoming.notes(), 1):
+        if cancelled is not None and cancelled():
+            counts["cancelled"] = True
+            break
+
+        with session.lock:
+            entry = session.index.get(title)
+            local_modified = entry["modified"] if entry is not None else None
+        if entry is None:
+            session.save(title, content, modified or None)
+            counts["added"] += 1
+        else:
+            digest = content_hash(content)
+            if content_hash(session.get(title, "")) == digest:
+                counts["duplicates"] += 1
+            elif policy == POLICY_NEWEST:
+                if modified > local_modified:
+                    session.save(title, content, modified)
+                    counts["updated"] += 1
+                else:
+                    counts["skipped"] += 1
+            elif policy == POLICY_KEEP_BOTH:
+                new_title = _free_title(session, title, digest)
+                if new_title is None:
+                    counts["duplicates"] += 1
+                else:
+                    session.save(new_title, content, modified or None)
+                    counts["renamed"] += 1
+            else:
+                counts["skipped"] += 1
+
+        if progress is not None:
+            progress(done, total)
+
+    # One index block and one fsync for the whole merge
+    session.checkpoint()
+    return counts
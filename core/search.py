@@ -0,0 +1,217 @@
+"""Encrypted full-text search index for Cryptex"""
+import json
+import math
+import os
+import re
+from bisect import bisect_left
+from core.database import iter_frames, read_payload, write_frame, replace_durably
+
+SEARCH_FILE = "data/search.enc"
+SEARCH_MAGIC = b"CRYPTEXS\x01"
+
+# The index file is a small log of its own: a snapshot of the term counts of
+# every note, followed by per-note updates appended as notes are saved.
+ENTRY_SNAPSHOT = 1
+ENTRY_UPDATE = 2
+ENTRY_DELETE = 3
+
+TOKEN_PATTERN = re.compile(r"\w+")
+MAX_TERM_LENGTH = 64
+TITLE_WEIGHT = 3
+MAX_PREFIX_TERMS = 50
+MAX_RESULTS = 200
+# Write a fresh snapshot once this many updates have piled up
+CHECKPOINT_UPDATES = 1000
+
+
+def tokenize(text):
+    """Lowercased word terms of a text"""
+    return [term for term in TOKEN_PATTERN.findall(text.lower())
+            if len(term) <= MAX_TERM_LENGTH]
+
+
+def term_counts(title, content):
+    """Weighted term frequencies of a note, title words count extra"""
+    counts = {}
+    for term in tokenize(title):
+        counts[term] = counts.get(term, 0) + TITLE_WEIGHT
+    for term in tokenize(content):
+        counts[term] = counts.get(term, 0) + 1
+    return counts
+
+
+class SearchIndex:
+    """Inverted index of note terms, persisted encrypted next to the vault
+
+    Saves and deletes update it in place and append a small encrypted
+    entry to the index file, so unlocking never has to re-read the notes.
+    """
+
+    def __init__(self, ctx, path=SEARCH_FILE):
+        self.ctx = ctx
+        self.path = path
+        self.documents = {}  # title -> {"modified": int, "terms": {term: count}}
+        self.postings = {}   # term -> {title: count}
+        self._vocabulary = None
+        self._updates = 0
+
+    def load(self):
+        """Load the latest snapshot and the updates written after it"""
+        self.documents = {}
+        self._updates = 0
+        if os.path.exists(self.path):
+            try:
+                self._replay()
+            except Exception as e:
+                # Wrong key after an import, or damaged: start over and let
+                # sync() reindex the notes
+                print(f"Search index unreadable, rebuilding: {e}")
+                self.documents = {}
+                self.checkpoint()
+
+        self.postings = {}
+        for title, doc in self.documents.items():
+            self._add_postings(title, doc["terms"])
+        self._vocabulary = None
+        return self
+
+    def _replay(self):
+        with open(self.path, "rb") as f:
+            if f.read(len(SEARCH_MAGIC)) != SEARCH_MAGIC:
+                raise ValueError("Not a search index")
+            end = os.fstat(f.fileno()).st_size
+            for _, etype, codec, length in iter_frames(f, end):
+                entry = json.loads(read_payload(self.ctx, f.read, etype, codec, length))
+                if etype == ENTRY_SNAPSHOT:
+                    self.documents = entry
+                    self._updates = 0
+                elif etype == ENTRY_UPDATE:
+                    self.documents[entry["title"]] = {
+                        "modified": entry["modified"], "terms": entry["terms"]}
+                    self._updates += 1
+                else:
+                    self.documents.pop(entry["title"], None)
+                    self._updates += 1
+
+    def sync(self, vault_index, get_content):
+        """Reindex only the notes whose modified time differs from the vault"""
+        changed = False
+        for title in list(self.documents):
+            if title not in vault_index:
+                self.remove(title, persist=False)
+                changed = True
+        for title, entry in vault_index.items():
+            doc = self.documents.get(title)
+            if doc is None or doc["modified"] != entry["modified"]:
+                self.update(title, get_content(title), entry["modified"], persist=False)
+                changed = True
+        if changed or self._updates >= CHECKPOINT_UPDATES:
+            self.checkpoint()
+
+    def update(self, title, content, modified, persist=True):
+        """Index a saved note"""
+        self._remove_postings(title)
+        terms = term_counts(title, content)
+        self.documents[title] = {"modified": modified, "terms": terms}
+        self._add_postings(title, terms)
+        if persist:
+            self._append(ENTRY_UPDATE, {"title": title, "modified": modified, "terms": terms})
+
+    def remove(self, title, persist=True):
+        """Drop a deleted note from the index"""
+        if title not in self.documents:
+            return
+        self._remove_postings(title)
+        del self.documents[title]
+        if persist:
+            self._append(ENTRY_DELETE, {"title": title})
+
+    def search(self, query, limit=MAX_RESULTS):
+        """Titles matching every query word, best TF-IDF score first
+
+        The last word also matches as a prefix so results follow typing.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        total = max(len(self.documents), 1)
+        scores = None
+        for i, term in enumerate(terms):
+            expanded = self._expand(term) if i == len(terms) - 1 else [term]
+            hits = {}
+            for match in expanded:
+                postings = self.postings.get(match)
+                if not postings:
+                    continue
+                idf = math.log(1 + total / len(postings))
+                for title, count in postings.items():
+                    hits[title] = max(hits.get(title, 0), count * idf)
+            if scores is None:
+                scores = hits
+            else:
+                scores = {title: score + hits[title]
+                          for title, score in scores.items() if title in hits}
+            if not scores:
+                return []
+
+        return sorted(scores, key=lambda title: (-scores[title], title))[:limit]
+
+    def checkpoint(self):
+        """Replace the index file with a single snapshot"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(SEARCH_MAGIC)
+            write_frame(self.ctx, f, ENTRY_SNAPSHOT, json.dumps(self.documents).encode())
+        replace_durably(tmp, self.path)
+        self._updates = 0
+
+    def close(self):
+        """Fold pending updates into a snapshot"""
+        if self._updates:
+            self.checkpoint()
+
+    def _append(self, etype, entry):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "ab") as f:
+            if f.tell() == 0:
+                f.write(SEARCH_MAGIC)
+            write_frame(self.ctx, f, etype, json.dumps(entry).encode())
+        self._updates += 1
+        if self._updates >= CHECKPOINT_UPDATES:
+            self.checkpoint()
+
+    def _add_postings(self, title, terms):
+        for term, count in terms.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                self._vocabulary = None
+            postings[title] = count
+
+    def _remove_postings(self, title):
+        doc = self.documents.get(title)
+        if doc is None:
+            return
+        for term in doc["terms"]:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(title, None)
+                if not postings:
+                    del self.postings[term]
+                    self._vocabulary = None
+
+    def _expand(self, prefix):
+        """Indexed terms starting with prefix, looked up in a sorted vocabulary"""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        matches = []
+        i = bisect_left(self._vocabulary, prefix)
+        while i < len(self._vocabulary) and len(matches) < MAX_PREFIX_TERMS:
+            term = self._vocabulary[i]
+            if not term.startswith(prefix):
+                break
+            matches.append(term)
+            i += 1
+        return matches
@@ -0,0 +1,111 @@
+"""Record serialization for the Cryptex vault"""
+import json
+import struct
+
+# Known record fields and their wire IDs; decoders skip IDs they don't know
+FIELD_IDS = {"title": 1, "content": 2, "modified": 3, "size": 4,
+             "offset": 5, "length": 6}
+FIELD_NAMES = {field_id: name for name, field_id in FIELD_IDS.items()}
+
+TYPE_STR = 1
+TYPE_INT = 2
+TYPE_BYTES = 3
+
+FIELD_HEADER = struct.Struct(">BBI")  # field ID, value type, value length
+INT_VALUE = struct.Struct(">q")
+INDEX_ENTRY = struct.Struct(">I")  # length of one serialized index entry
+
+
+class JsonSerializer:
+    """Original JSON record encoding, payloads start with '{'"""
+
+    version = ord("{")
+
+    def encode(self, record):
+        return json.dumps(record).encode()
+
+    def decode(self, data):
+        return json.loads(bytes(data))
+
+
+class BinarySerializer:
+    """Length-prefixed binary records: version byte, then one frame per field"""
+
+    version = 1
+
+    def encode(self, record):
+        parts = [bytes((self.version,))]
+        for name, value in record.items():
+            if isinstance(value, str):
+                vtype, raw = TYPE_STR, value.encode()
+            elif isinstance(value, bool) or not isinstance(value, (int, bytes)):
+                raise TypeError(f"Unsupported value for field {name}: {type(value)}")
+            elif isinstance(value, int):
+                vtype, raw = TYPE_INT, INT_VALUE.pack(value)
+            else:
+                vtype, raw = TYPE_BYTES, value
+            parts.append(FIELD_HEADER.pack(FIELD_IDS[name], vtype, len(raw)))
+            parts.append(raw)
+        return b"".join(parts)
+
+    def decode(self, data):
+        view = memoryview(data)
+        record = {}
+        offset = 1
+        end = len(view)
+        while offset < end:
+            field_id, vtype, length = FIELD_HEADER.unpack_from(view, offset)
+            offset += FIELD_HEADER.size
+            value = view[offset:offset + length]
+            offset += length
+            name = FIELD_NAMES.get(field_id)
+            if name is None:
+                continue
+            if vtype == TYPE_STR:
+                record[name] = str(value, "utf-8")
+            elif vtype == TYPE_INT:
+                record[name] = INT_VALUE.unpack(value)[0]
+            else:
+                record[name] = bytes(value)
+        return record
+
+
+SERIALIZERS = {s.version: s for s in (JsonSerializer(), BinarySerializer())}
+DEFAULT_SERIALIZER = SERIALIZERS[BinarySerializer.version]
+
+
+def encode_record(record):
+    """Serialize a record with the current format"""
+    return DEFAULT_SERIALIZER.encode(record)
+
+
+def decode_record(data):
+    """Deserialize a record written by any known format"""
+    serializer = SERIALIZERS.get(data[0]) if data else None
+    if serializer is None:
+        raise ValueError("Unknown record format")
+    return serializer.decode(data)
+
+
+def encode_index(index):
+    """Serialize a title -> entry index as length-prefixed records"""
+    parts = []
+    for title, entry in index.items():
+        data = encode_record(dict(entry, title=title))
+        parts.append(INDEX_ENTRY.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def decode_index(data):
+    """Deserialize an index written by encode_index"""
+    view = memoryview(data)
+    index = {}
+    offset = 0
+    while offset < len(view):
+        (length,) = INDEX_ENTRY.unpack_from(view, offset)
+        offset += INDEX_ENTRY.size
+        entry = decode_record(view[offset:offset + length])
+        offset += length
+        index[entry.pop("title")] = entry
+    return index
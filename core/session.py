@@ -0,0 +1,272 @@
+"""In-memory vault session for Cryptex"""
+import threading
+import time
+from collections import OrderedDict
+from core.encryptor import derive_key
+from core.search import SearchIndex
+from core.merge import IncomingVault
+from core.database import (RECORD_PUT, RECORD_DELETE, FORMAT_LOG, vault_header,
+                           read_legacy_vault, read_index, write_vault, VaultReader,
+                           append_record, append_index, needs_compaction,
+                           compact, new_stats, sync_vault, SYNC_BATCH_RECORDS)
+
+
+# Decrypted bodies kept around after being opened
+CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+
+class NoteCache:
+    """Bounded LRU of decrypted note bodies, sized by content length"""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._size = 0
+
+    def get(self, title):
+        content = self._items.get(title)
+        if content is not None:
+            self._items.move_to_end(title)
+        return content
+
+    def put(self, title, content):
+        self.discard(title)
+        if len(content) > self.max_bytes:
+            return
+        self._items[title] = content
+        self._size += len(content)
+        while self._size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self._size -= len(evicted)
+
+    def discard(self, title):
+        content = self._items.pop(title, None)
+        if content is not None:
+            self._size -= len(content)
+
+    def clear(self):
+        self._items.clear()
+        self._size = 0
+
+
+class VaultSession:
+    """Unlocked vault kept open from login until the app closes
+
+    Unlock decrypts only the title index; note bodies are decrypted from
+    the memory-mapped vault when they are asked for and the most recent
+    ones are kept in a bounded cache. Every change is written through to
+    the log, so a save costs one encrypt and one append. The key is
+    derived once in open() and the resulting context is reused for
+    every record. Appends are fsync'd in batches by sync(), and unlock
+    replays whatever made it to disk after the last index block. The
+    search index is loaded on first use or by load_search(), not at unlock.
+    """
+
+    def __init__(self, pin):
+        self._pin = pin
+        self.ctx = None
+        self.index = {}
+        self.lock = threading.RLock()
+        self.reader = VaultReader()
+        self.cache = NoteCache()
+        self.search_index = None
+        # Titles saved or deleted before the search index was loaded
+        self._unsearched = set()
+        self._search_lock = threading.Lock()
+        self._closed = False
+        self._stats = new_stats()
+        self._unindexed = 0
+        self._unsynced = 0
+        self._compacting = False
+
+    def open(self):
+        """Derive the key and load the note index"""
+        with self.lock:
+            self.cache.clear()
+            fmt, params = vault_header()
+            if fmt == FORMAT_LOG:
+                self.ctx = derive_key(self._pin, params)
+                self.index, self._stats, self._unindexed = read_index(self.ctx)
+            else:
+                # New vault, or one keyed with the unsalted PIN hash:
+                # re-encrypt it under a freshly salted KDF key
+                notes = {}
+                if fmt is not None:
+                    notes = read_legacy_vault(self._pin)
+                self.ctx = derive_key(self._pin)
+                self.index, self._stats = write_vault(self.ctx, notes)
+                self._unindexed = 0
+        self.checkpoint()
+        return self
+
+    def titles(self):
+        """Sorted note titles"""
+        with self.lock:
+            return sorted(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, title):
+        return title in self.index
+
+    def search(self, query):
+        """Titles matching a full-text query, best match first"""
+        search_index = self.load_search()
+        with self.lock:
+            return search_index.search(query)
+
+    def load_search(self):
+        """Load the search index and bring it up to date, once per session
+
+        The index file is decrypted without holding the session lock, so
+        reads and saves carry on meanwhile; changes made before it is ready
+        are applied right after.
+        """
+        with self._search_lock:
+            if self.search_index is not None or self._closed:
+                return self.search_index
+            search_index = SearchIndex(self.ctx).load()
+            with self.lock:
+                search_index.sync(self.index, self.get)
+                for title in self._unsearched:
+                    entry = self.index.get(title)
+                    if entry is None:
+                        search_index.remove(title)
+                    else:
+                        search_index.update(title, self.get(title), entry["modified"])
+                self._unsearched.clear()
+                self.search_index = search_index
+            return search_index
+
+    def _searchable(self, title, content=None, modified=None):
+        """Apply a save, or a delete when content is None, to the search index"""
+        if self.search_index is None:
+            self._unsearched.add(title)
+        elif content is None:
+            self.search_index.remove(title)
+        else:
+            self.search_index.update(title, content, modified)
+
+    def get(self, title, default=None):
+        """Decrypt and return the content of a note"""
+        with self.lock:
+            entry = self.index.get(title)
+            if entry is None:
+                return default
+            content = self.cache.get(title)
+            if content is None:
+                content = self.reader.read_record(self.ctx, entry)["content"]
+                self.cache.put(title, content)
+            return content
+
+    def save(self, title, content, modified=None):
+        """Write a note through to the vault, modified defaults to now"""
+        if modified is None:
+            modified = int(time.time())
+        record = {"title": title, "content": content, "modified": modified}
+        with self.lock:
+            append_record(self.ctx, RECORD_PUT, record, self.index, self._stats)
+            self.cache.put(title, content)
+            self._searchable(title, content, record["modified"])
+            self._appended()
+        self._maybe_compact()
+
+    def save_many(self, notes):
+        """Write (title, content, modified) notes as one batch
+
+        The records are appended without the usual batch fsyncs and
+        committed together by a single checkpoint. Returns the count.
+        """
+        count = 0
+        with self.lock:
+            for title, content, modified in notes:
+                record = {"title": title, "content": content,
+                          "modified": modified or int(time.time())}
+                append_record(self.ctx, RECORD_PUT, record, self.index, self._stats)
+                self.cache.put(title, content)
+                self._searchable(title, content, record["modified"])
+                self._unindexed += 1
+                self._unsynced += 1
+                count += 1
+            self.checkpoint()
+        self._maybe_compact()
+        return count
+
+    def delete(self, title):
+        """Delete a note from the vault"""
+        with self.lock:
+            if title not in self.index:
+                return
+            append_record(self.ctx, RECORD_DELETE, {"title": title},
+                          self.index, self._stats)
+            self.cache.discard(title)
+            self._searchable(title)
+            self._appended()
+        self._maybe_compact()
+
+    def sync(self):
+        """Make every change so far durable with one fsync (group commit)"""
+        with self.lock:
+            if self._unsynced:
+                sync_vault()
+                self._unsynced = 0
+
+    def open_incoming(self, path, pin=None):
+        """Open another vault for merging, with this vault's PIN unless pin is given"""
+        return IncomingVault(path, pin or self._pin)
+
+    def checkpoint(self):
+        """Write a fresh index block if records were added since the last one"""
+        with self.lock:
+            if self._unindexed:
+                append_index(self.ctx, self.index, self._stats)
+                self._unindexed = 0
+                self._unsynced += 1
+            self.sync()
+
+    def _appended(self):
+        """Count a record appended to the log, syncing once a batch is full"""
+        self._unindexed += 1
+        self._unsynced += 1
+        if self._unsynced >= SYNC_BATCH_RECORDS:
+            self.sync()
+
+    def close(self):
+        """Checkpoint the index and drop decrypted notes and the memory map"""
+        try:
+            self.checkpoint()
+            # Waits for a search index load that is still running
+            with self._search_lock:
+                self._closed = True
+            if self.search_index is not None:
+                self.search_index.close()
+            self.cache.clear()
+            self.reader.close()
+        except Exception as e:
+            print(f"Error closing vault: {e}")
+
+    def _maybe_compact(self):
+        """Start a background compaction when the log has too much dead space"""
+        with self.lock:
+            if self._compacting or not needs_compaction(self._stats):
+                return
+            self._compacting = True
+        threading.Thread(target=self._compact, daemon=True).start()
+
+    def _compact(self):
+        try:
+            if compact(self.ctx, self.index, self._stats, self.lock):
+                with self.lock:
+                    # The swap fsync'd the rewritten log, only the index
+                    # block appended after it is still unsynced
+                    self._unindexed = 0
+                    self._unsynced = 1
+        finally:
+            with self.lock:
+                self._compacting = False
+
+
+def open_session(pin):
+    """Open the vault for the given PIN"""
+    return VaultSession(pin).open()
@@ -1,65 +1,171 @@
 """Settings management for Cryptex"""
+import atexit
 import json
 import os
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, Callable
 
 SETTINGS_FILE = "data/settings.json"
 
-DEFAULT_SETTINGS = {
-    "theme": "dark_modern",
-    "auto_save": True,
-    "auto_save_interval": 30,  # seconds
-    "show_welcome": True,
-    "font_size": 14,
-    "window_geometry": None,
-    "backup_on_exit": False,
-    "session_timeout": 0,  # 0 = no timeout
-    "show_note_count": True,
-    "confirm_delete": True,
-    "recent_files": []
+# Changes are written this long after the last one, or at exit
+FLUSH_DELAY = 1.0  # seconds
+
+# key -> (accepted types, default)
+SETTINGS_SCHEMA = {
+    "theme": (str, "dark_modern"),
+    "auto_save": (bool, True),
+    "auto_save_interval": (int, 30),  # seconds
+    "show_welcome": (bool, True),
+    "font_size": (int, 14),
+    "window_geometry": ((list, type(None)), None),
+    "backup_on_exit": (bool, False),
+    "backup_keep": (int, 30),  # snapshots kept by retention, see core.backup
+    "session_timeout": (int, 0),  # 0 = no timeout
+    "show_note_count": (bool, True),
+    "confirm_delete": (bool, True),
+    "recent_files": (list, []),
+    "unlock_budget_ms": (int, 500),  # target time for one PIN check
+    "argon2_params": ((dict, type(None)), None),  # calibrated for this host, see core.auth
 }
 
+DEFAULT_SETTINGS = {key: default for key, (_, default) in SETTINGS_SCHEMA.items()}
+
+def _valid(key: str, value: Any) -> bool:
+    """Check a value against the schema, unknown keys take anything"""
+    if key not in SETTINGS_SCHEMA:
+        return True
+    types = SETTINGS_SCHEMA[key][0]
+    if isinstance(value, bool) and bool not in (types if isinstance(types, tuple) else (types,)):
+        # bool is an int subclass, don't let True pass as a number
+        return False
+    return isinstance(value, types)
+
+def _defaults() -> Dict[str, Any]:
+    return json.loads(json.dumps(DEFAULT_SETTINGS))
+
 class Settings:
+    """Settings kept in memory and written to disk in batches
+
+    set() only marks the settings dirty; the file is rewritten FLUSH_DELAY
+    after the last change, or at exit, through a temp file and rename.
+    Subscribers hear about every change in the thread that made it.
+    """
+
     def __init__(self):
-        self.settings = self.load_settings()
-    
+        # Read on first use, not when the module is imported
+        self._settings = None
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._timer = None
+        self._subscribers = {}
+        atexit.register(self.flush)
+
+    @property
+    def settings(self) -> Dict[str, Any]:
+        if self._settings is None:
+            self._settings = self.load_settings()
+        return self._settings
+
+    @settings.setter
+    def settings(self, value: Dict[str, Any]):
+        self._settings = value
+
     def load_settings(self) -> Dict[str, Any]:
         """Load settings from file or return defaults"""
         if not os.path.exists(SETTINGS_FILE):
-            return DEFAULT_SETTINGS.copy()
-        
+            return _defaults()
+
         try:
             with open(SETTINGS_FILE, 'r') as f:
                 loaded = json.load(f)
-                # Merge with defaults to ensure all keys exist
-                settings = DEFAULT_SETTINGS.copy()
-                settings.update(loaded)
+                # Merge with defaults to ensure all keys exist, dropping
+                # values of the wrong type
+                settings = _defaults()
+                for key, value in loaded.items():
+                    if _valid(key, value):
+                        settings[key] = value
+                    else:
+                        print(f"Ignoring invalid setting {key}: {value!r}")
                 return settings
         except Exception:
-            return DEFAULT_SETTINGS.copy()
-    
+            return _defaults()
+
     def save_settings(self):
         """Save current settings to file"""
         os.makedirs("data", exist_ok=True)
         try:
-            with open(SETTINGS_FILE, 'w') as f:
-                json.dump(self.settings, f, indent=2)
+            with self._lock:
+                data = json.dumps(self.settings, indent=2)
+                self._dirty = False
+            tmp = SETTINGS_FILE + ".tmp"
+            with open(tmp, 'w') as f:
+                f.write(data)
+            os.replace(tmp, SETTINGS_FILE)
         except Exception as e:
             print(f"Failed to save settings: {e}")
-    
+
+    def flush(self):
+        """Write pending changes now"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+        self.save_settings()
+
     def get(self, key: str, default=None):
         """Get a setting value"""
         return self.settings.get(key, default)
-    
+
     def set(self, key: str, value: Any):
-        """Set a setting value"""
-        self.settings[key] = value
-        self.save_settings()
-    
+        """Set a setting value, saved to disk shortly after"""
+        if not _valid(key, value):
+            raise TypeError(f"Invalid value for setting {key}: {value!r}")
+        with self._lock:
+            if key in self.settings and self.settings[key] == value:
+                return
+            self.settings[key] = value
+            self._schedule_flush()
+        self._notify(key, value)
+
+    def subscribe(self, key: str, callback: Callable[[Any], None]):
+        """Call callback(value) whenever key changes"""
+        with self._lock:
+            self._subscribers.setdefault(key, []).append(callback)
+
+    def unsubscribe(self, key: str, callback: Callable[[Any], None]):
+        with self._lock:
+            callbacks = self._subscribers.get(key, [])
+            if callback in callbacks:
+                callbacks.remove(callback)
+
     def reset_to_defaults(self):
         """Reset all settings to defaults"""
-        self.settings = DEFAULT_SETTINGS.copy()
-        self.save_settings()
+        with self._lock:
+            old = self.settings
+            self.settings = _defaults()
+            self._schedule_flush()
+        for key, value in self.settings.items():
+            if old.get(key) != value:
+                self._notify(key, value)
+
+    def _schedule_flush(self):
+        self._dirty = True
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(FLUSH_DELAY, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _notify(self, key: str, value: Any):
+        with self._lock:
+            callbacks = list(self._subscribers.get(key, []))
+        for callback in callbacks:
+            try:
+                callback(value)
+            except Exception as e:
+                print(f"Settings subscriber error for {key}: {e}")
 
 # Global settings instance
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -0,0 +1,142 @@
+"""Lightweight tracing of hot paths for Cryptex
+
+Set CRYPTEX_TRACE=1 to record from startup, or CRYPTEX_TRACE=<file> to
+also append every event to a JSONL file. While tracing is off, trace()
+hands back a shared no-op context and traced functions cost one check.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+RING_SIZE = 4096
+
+_events = deque(maxlen=RING_SIZE)  # (name, start, seconds, bytes)
+_enabled = False
+_jsonl = None
+_jsonl_lock = threading.Lock()
+
+
+class _NullSpan:
+    """Stand-in returned while tracing is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add_bytes(self, count):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """Times one traced operation and records it on exit"""
+    __slots__ = ("name", "nbytes", "start")
+
+    def __init__(self, name, nbytes):
+        self.name = name
+        self.nbytes = nbytes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start, self.nbytes, self.start)
+        return False
+
+    def add_bytes(self, count):
+        self.nbytes = (self.nbytes or 0) + count
+
+
+def enable(jsonl_path=None):
+    """Start recording, optionally appending events to a JSONL file"""
+    global _enabled, _jsonl
+    with _jsonl_lock:
+        if jsonl_path and _jsonl is None:
+            _jsonl = open(jsonl_path, "a", buffering=1)
+    _enabled = True
+
+
+def disable():
+    """Stop recording and close the JSONL file, recorded events stay"""
+    global _enabled, _jsonl
+    _enabled = False
+    with _jsonl_lock:
+        if _jsonl is not None:
+            _jsonl.close()
+            _jsonl = None
+
+
+def is_enabled():
+    return _enabled
+
+
+def trace(name, nbytes=None):
+    """Context manager timing the block as name, with an optional byte count"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, nbytes)
+
+
+def traced(name):
+    """Decorator timing every call of a function as name"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record(name, seconds, nbytes=None, start=None):
+    """Add a finished event to the ring buffer and the JSONL file"""
+    _events.append((name, start, seconds, nbytes))
+    if _jsonl is not None:
+        line = json.dumps({"name": name, "time": time.time(),
+                           "ms": round(seconds * 1000, 3), "bytes": nbytes})
+        with _jsonl_lock:
+            if _jsonl is not None:
+                _jsonl.write(line + "\n")
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summary():
+    """Per operation count, p50 and p95 in ms and total bytes, from the ring buffer"""
+    durations = {}
+    totals = {}
+    for name, _, seconds, nbytes in list(_events):
+        durations.setdefault(name, []).append(seconds)
+        if nbytes:
+            totals[name] = totals.get(name, 0) + nbytes
+    result = {}
+    for name, values in durations.items():
+        values.sort()
+        result[name] = {
+            "count": len(values),
+            "p50": _percentile(values, 0.5) * 1000,
+            "p95": _percentile(values, 0.95) * 1000,
+            "bytes": totals.get(name, 0),
+        }
+    return result
+
+
+def clear():
+    _events.clear()
+
+
+_env = os.environ.get("CRYPTEX_TRACE")
+if _env:
+    enable(None if _env == "1" else _env)
@@ -0,0 +1,271 @@
+"""
+Cryptex command line - bulk vault operations without the GUI
+
+    python cryptex.py init
+    python cryptex.py import notes.csv | notes.json | notes_dir/
+    python cryptex.py export backup.json | backup.csv | notes_dir/ | -
+    python cryptex.py list [--search QUERY]
+    python cryptex.py get TITLE
+    python cryptex.py delete TITLE [TITLE ...]
+
+The PIN is read from --pin, the CRYPTEX_PIN environment variable or a
+prompt. Each command unlocks the vault once, and bulk imports are
+written as one batch with a single commit. PyQt is never imported, so
+this runs on machines without a display.
+"""
+import argparse
+import csv
+import getpass
+import json
+import os
+import sys
+
+FORMATS = ("csv", "json", "md")
+MARKDOWN_SUFFIX = ".md"
+# Same rule as the login window, which only takes 4 to 6 digits
+MIN_PIN_LENGTH = 4
+MAX_PIN_LENGTH = 6
+# Characters that cannot appear in a file name on some platform
+UNSAFE_FILENAME_CHARS = '<>:"/\\|?*'
+
+def detect_format(path, fmt=None):
+    """Format given explicitly, or guessed from the path"""
+    if fmt:
+        return fmt
+    if path == "-":
+        return "json"
+    if os.path.isdir(path) or not os.path.splitext(path)[1]:
+        return "md"
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext in ("csv", "json"):
+        return ext
+    if ext in ("md", "markdown"):
+        return "md"
+    raise ValueError(f"Cannot tell the format of {path}, use --format")
+
+def _modified(value):
+    """Modification time from an import file, None means now"""
+    if value in (None, ""):
+        return None
+    return int(float(value))
+
+def read_csv(path):
+    """Yield (title, content, modified) from a CSV with a header row"""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        if not reader.fieldnames or not {"title", "content"} <= set(reader.fieldnames):
+            raise ValueError("CSV needs 'title' and 'content' columns")
+        for row in reader:
+            yield _note(row["title"], row["content"] or "", _modified(row.get("modified")))
+
+def _note(title, content, modified=None):
+    """Check a note read from an import file"""
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError(f"Note title must be non-empty text: {title!r}")
+    if not isinstance(content, str):
+        raise ValueError(f"Content of '{title}' must be text, not {type(content).__name__}")
+    return title, content, modified
+
+def read_json(path):
+    """Yield notes from a {title: content} object or a list of note objects"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        for title, content in data.items():
+            yield _note(title, content)
+    elif isinstance(data, list):
+        for note in data:
+            if not isinstance(note, dict):
+                raise ValueError(f"Expected a note object, got {note!r}")
+            yield _note(note.get("title"), note.get("content", ""),
+                        _modified(note.get("modified")))
+    else:
+        raise ValueError("JSON must be an object or a list of notes")
+
+def read_markdown(path):
+    """Yield one note per .md file, titled after the file name"""
+    for name in sorted(os.listdir(path)):
+        if not name.lower().endswith(MARKDOWN_SUFFIX):
+            continue
+        file_path = os.path.join(path, name)
+        with open(file_path, encoding="utf-8") as f:
+            content = f.read()
+        yield name[:-len(MARKDOWN_SUFFIX)], content, int(os.path.getmtime(file_path))
+
+READERS = {"csv": read_csv, "json": read_json, "md": read_markdown}
+
+def _safe_filename(title):
+    name = "".join("_" if c in UNSAFE_FILENAME_CHARS or ord(c) < 32 else c for c in title)
+    return name.strip(" .") or "untitled"
+
+def write_notes(notes, path, fmt):
+    """Write (title, content, modified) notes out, returns how many"""
+    count = 0
+    if fmt == "md":
+        os.makedirs(path, exist_ok=True)
+        used = set()
+        for title, content, modified in notes:
+            name = _safe_filename(title)
+            base, n = name, 1
+            while name.lower() in used:
+                n += 1
+                name = f"{base} ({n})"
+            used.add(name.lower())
+            file_path = os.path.join(path, name + MARKDOWN_SUFFIX)
+            with open(file_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            if modified:
+                os.utime(file_path, (modified, modified))
+            count += 1
+        return count
+
+    out = sys.stdout if path == "-" else open(path, "w", newline="", encoding="utf-8")
+    try:
+        if fmt == "csv":
+            writer = csv.writer(out)
+            writer.writerow(["title", "content", "modified"])
+            for title, content, modified in notes:
+                writer.writerow([title, content, modified])
+                count += 1
+        else:
+            # Written note by note so only one body is in memory at a time
+            out.write("[")
+            for title, content, modified in notes:
+                out.write(",\n  " if count else "\n  ")
+                json.dump({"title": title, "content": content, "modified": modified},
+                          out, ensure_ascii=False)
+                count += 1
+            out.write("\n]\n" if count else "]\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return count
+
+def read_pin(args):
+    pin = args.pin or os.environ.get("CRYPTEX_PIN")
+    if pin is None:
+        pin = getpass.getpass("PIN: ")
+    return pin
+
+def unlock(args):
+    """Check the PIN and open the vault, once per command"""
+    from core.auth import pin_exists, check_pin
+    if not pin_exists():
+        raise SystemExit("No PIN is set, run 'init' first")
+    pin = read_pin(args)
+    if not check_pin(pin):
+        raise SystemExit("Incorrect PIN")
+    from core.session import open_session
+    return open_session(pin)
+
+def cmd_init(args):
+    from core.auth import pin_exists, set_pin
+    if pin_exists():
+        raise SystemExit("A PIN is already set")
+    pin = read_pin(args)
+    if not pin.isdigit() or not MIN_PIN_LENGTH <= len(pin) <= MAX_PIN_LENGTH:
+        raise SystemExit(f"PIN must be {MIN_PIN_LENGTH}-{MAX_PIN_LENGTH} digits")
+    if not set_pin(pin):
+        return 1
+    from core.session import open_session
+    open_session(pin).close()
+    print("Vault created")
+    return 0
+
+def cmd_import(args, session):
+    # Parsed in full first, so a bad row fails before anything is written
+    notes = list(READERS[detect_format(args.source, args.format)](args.source))
+    if args.skip_existing:
+        notes = [note for note in notes if note[0] not in session]
+    count = session.save_many(notes)
+    print(f"Imported {count} notes")
+    return 0
+
+def _all_notes(session):
+    for title in session.titles():
+        yield title, session.get(title), session.index[title]["modified"]
+
+def cmd_export(args, session):
+    count = write_notes(_all_notes(session), args.target, detect_format(args.target, args.format))
+    if args.target != "-":
+        print(f"Exported {count} notes")
+    return 0
+
+def cmd_list(args, session):
+    titles = session.search(args.search) if args.search else session.titles()
+    for title in titles:
+        print(title)
+    return 0
+
+def cmd_get(args, session):
+    content = session.get(args.title)
+    if content is None:
+        print(f"No note titled '{args.title}'", file=sys.stderr)
+        return 1
+    sys.stdout.write(content)
+    if content and not content.endswith("\n"):
+        sys.stdout.write("\n")
+    return 0
+
+def cmd_delete(args, session):
+    missing = [title for title in args.titles if title not in session]
+    for title in args.titles:
+        session.delete(title)
+    for title in missing:
+        print(f"No note titled '{title}'", file=sys.stderr)
+    print(f"Deleted {len(args.titles) - len(missing)} notes")
+    return 1 if missing else 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cryptex", description="Cryptex vault from the command line")
+    parser.add_argument("-C", "--directory", help="folder holding the data/ directory (default: current)")
+    parser.add_argument("--pin", help="vault PIN (default: $CRYPTEX_PIN or a prompt)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("init", help="set the PIN and create an empty vault")
+
+    p = commands.add_parser("import", help="add notes from a CSV or JSON file or a Markdown folder")
+    p.add_argument("source")
+    p.add_argument("--format", choices=FORMATS)
+    p.add_argument("--skip-existing", action="store_true", help="keep notes that already exist")
+
+    p = commands.add_parser("export", help="write every note to a file, a folder or - for stdout")
+    p.add_argument("target")
+    p.add_argument("--format", choices=FORMATS)
+
+    p = commands.add_parser("list", help="print note titles")
+    p.add_argument("--search", help="only notes matching a full-text query")
+
+    p = commands.add_parser("get", help="print one note")
+    p.add_argument("title")
+
+    p = commands.add_parser("delete", help="delete notes")
+    p.add_argument("titles", nargs="+")
+    return parser
+
+COMMANDS = {"import": cmd_import, "export": cmd_export, "list": cmd_list,
+            "get": cmd_get, "delete": cmd_delete}
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.directory:
+        os.chdir(args.directory)
+    os.makedirs("data", exist_ok=True)
+    if args.command == "init":
+        return cmd_init(args)
+
+    session = unlock(args)
+    try:
+        return COMMANDS[args.command](args, session)
+    except BrokenPipeError:
+        # Output piped into something like head, which stopped reading
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
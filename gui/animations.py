@@ -1,81 +1,195 @@
 """
 Smooth animations for Cryptex using PyQt6
 """
-from PyQt6.QtCore import QPropertyAnimation, QEasingCurve, QTimer, pyqtSignal, QObject
+import time
+from PyQt6.QtCore import (QPropertyAnimation, QAbstractAnimation, QEasingCurve,
+                          QTimer, pyqtSignal, QObject)
 from PyQt6.QtWidgets import QGraphicsOpacityEffect
 from PyQt6.QtGui import QFont
 
+# Frame monitor: sample the event loop at ~60 Hz while animations run
+FRAME_INTERVAL_MS = 16
+# Average frame lag that counts as falling behind, and when it has recovered
+LAG_LIMIT_MS = 40
+LAG_RECOVERED_MS = 20
+LAG_SMOOTHING = 0.2
+# How long non-essential animations stay off after the loop fell behind
+DEGRADED_SECONDS = 5.0
+
+class FrameMonitor(QObject):
+    """Measures event loop lag while animations are running
+
+    The timer only ticks while at least one animation is active, so an
+    idle app does not wake up sixty times a second.
+    """
+
+    degraded_changed = pyqtSignal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._timer = None
+        self._last_tick = None
+        self._average_lag = 0.0
+        self._degraded_until = 0.0
+        self._degraded = False
+
+    def start(self):
+        if self._timer is None:
+            self._timer = QTimer(self)
+            self._timer.setInterval(FRAME_INTERVAL_MS)
+            self._timer.timeout.connect(self._tick)
+        if not self._timer.isActive():
+            self._last_tick = time.perf_counter()
+            self._timer.start()
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.stop()
+
+    def average_lag_ms(self):
+        return self._average_lag
+
+    def is_degraded(self):
+        """Whether non-essential animations should be skipped right now"""
+        if self._degraded and time.monotonic() >= self._degraded_until:
+            self._set_degraded(False)
+        return self._degraded
+
+    def _tick(self):
+        now = time.perf_counter()
+        lag = max(0.0, (now - self._last_tick) * 1000 - FRAME_INTERVAL_MS)
+        self._last_tick = now
+        self._average_lag += (lag - self._average_lag) * LAG_SMOOTHING
+        if self._average_lag > LAG_LIMIT_MS:
+            self._degraded_until = time.monotonic() + DEGRADED_SECONDS
+            self._set_degraded(True)
+        elif self._degraded and self._average_lag < LAG_RECOVERED_MS:
+            self._set_degraded(False)
+
+    def _set_degraded(self, degraded):
+        if degraded != self._degraded:
+            self._degraded = degraded
+            self.degraded_changed.emit(degraded)
+
 class AnimationManager(QObject):
-    """Manages all animations in the application"""
-    
+    """Manages all animations in the application
+
+    Only running animations are kept: each one removes and deletes itself
+    when it finishes, a new animation of the same widget property replaces
+    the running one, and opacity effects are reused per widget.
+    """
+
     def __init__(self):
         super().__init__()
         self.animations = []
-    
+        self._by_target = {}  # (target id, property) -> running animation
+        self.monitor = FrameMonitor(self)
+
+    def _opacity_effect(self, widget):
+        """The widget's opacity effect, created on first use"""
+        effect = widget.graphicsEffect()
+        if not isinstance(effect, QGraphicsOpacityEffect):
+            effect = QGraphicsOpacityEffect(widget)
+            widget.setGraphicsEffect(effect)
+        return effect
+
+    def _start(self, animation, essential=False):
+        """Run an animation, or jump to its end when the UI is falling behind"""
+        target = animation.targetObject()
+        key = (id(target), bytes(animation.propertyName()))
+        previous = self._by_target.get(key)
+        if previous is not None:
+            previous.stop()
+
+        if not essential and self.monitor.is_degraded():
+            end = animation.endValue()
+            animation.deleteLater()
+            if end is not None:
+                target.setProperty(bytes(animation.propertyName()).decode(), end)
+            return None
+
+        self._by_target[key] = animation
+        self.animations.append(animation)
+        # Stopped covers finishing, being replaced and the target going away
+        animation.stateChanged.connect(
+            lambda state, _old: state == QAbstractAnimation.State.Stopped
+            and self._finished(key, animation))
+        self.monitor.start()
+        animation.start()
+        return animation
+
+    def _finished(self, key, animation):
+        """Forget a finished or replaced animation and free it"""
+        if animation not in self.animations:
+            return
+        self.animations.remove(animation)
+        if self._by_target.get(key) is animation:
+            del self._by_target[key]
+        animation.deleteLater()
+        if not self.animations:
+            self.monitor.stop()
+
     def fade_in(self, widget, duration=300):
         """Fade in animation"""
-        effect = QGraphicsOpacityEffect()
-        widget.setGraphicsEffect(effect)
-        
+        effect = self._opacity_effect(widget)
+
         animation = QPropertyAnimation(effect, b"opacity")
         animation.setDuration(duration)
-        animation.setStartValue(0.0)
+        animation.setStartValue(effect.opacity() if self._running(effect) else 0.0)
         animation.setEndValue(1.0)
         animation.setEasingCurve(QEasingCurve.Type.OutCubic)
-        
-        self.animations.append(animation)
-        animation.start()
-        return animation
-    
+
+        return self._start(animation)
+
     def fade_out(self, widget, duration=300):
         """Fade out animation"""
-        effect = QGraphicsOpacityEffect()
-        widget.setGraphicsEffect(effect)
-        
+        effect = self._opacity_effect(widget)
+
         animation = QPropertyAnimation(effect, b"opacity")
         animation.setDuration(duration)
-        animation.setStartValue(1.0)
+        animation.setStartValue(effect.opacity() if self._running(effect) else 1.0)
         animation.setEndValue(0.0)
         animation.setEasingCurve(QEasingCurve.Type.InCubic)
-        
-        self.animations.append(animation)
-        animation.start()
-        return animation
-    
+
+        return self._start(animation)
+
     def shake_widget(self, widget, duration=500):
         """Shake animation for errors"""
+        previous = self._by_target.get((id(widget), b"pos"))
         animation = QPropertyAnimation(widget, b"pos")
         animation.setDuration(duration)
         animation.setEasingCurve(QEasingCurve.Type.OutBounce)
-        
-        start_pos = widget.pos()
+
+        # Shake around where the widget rests, not where a running shake left it
+        start_pos = previous.startValue() if previous is not None else widget.pos()
         animation.setStartValue(start_pos)
         animation.setKeyValueAt(0.1, start_pos + widget.rect().topLeft() + widget.rect().center() * 0.02)
         animation.setKeyValueAt(0.2, start_pos - widget.rect().topLeft() - widget.rect().center() * 0.02)
         animation.setKeyValueAt(0.3, start_pos + widget.rect().topLeft() + widget.rect().center() * 0.01)
         animation.setKeyValueAt(0.4, start_pos - widget.rect().topLeft() - widget.rect().center() * 0.01)
         animation.setEndValue(start_pos)
-        
-        self.animations.append(animation)
-        animation.start()
-        return animation
-    
+
+        # Error feedback still plays when the UI is busy
+        return self._start(animation, essential=True)
+
     def pulse_widget(self, widget, duration=200):
         """Pulse animation for success"""
+        if self.monitor.is_degraded():
+            return
         original_font = widget.font()
         larger_font = QFont(original_font)
         larger_font.setPointSize(original_font.pointSize() + 2)
-        
+
         # Pulse effect using font size
         def pulse_step1():
             widget.setFont(larger_font)
             QTimer.singleShot(duration // 2, pulse_step2)
-        
+
         def pulse_step2():
             widget.setFont(original_font)
-        
+
         pulse_step1()
-    
+
     def smooth_transition(self, widget, property_name, start_value, end_value, duration=300):
         """Generic smooth transition animation"""
         animation = QPropertyAnimation(widget, property_name.encode())
@@ -83,10 +197,13 @@ class AnimationManager(QObject):
         animation.setStartValue(start_value)
         animation.setEndValue(end_value)
         animation.setEasingCurve(QEasingCurve.Type.OutCubic)
-        
-        self.animations.append(animation)
-        animation.start()
-        return animation
+
+        return self._start(animation)
+
+    def _running(self, target):
+        """Whether some animation of target is in progress"""
+        return any(key[0] == id(target) and anim.state() == QAbstractAnimation.State.Running
+                   for key, anim in self._by_target.items())
 
 # Global animation manager
-animator = AnimationManager()
\ No newline at end of file
+animator = AnimationManager()
@@ -0,0 +1,96 @@
+"""
+Auto-save for the Cryptex dashboard
+"""
+import time
+from PyQt6.QtCore import QObject, QTimer
+from core.settings import settings
+
+# Typing pause before a dirty note is written
+IDLE_DELAY_MS = 1500
+
+class AutoSaver(QObject):
+    """Writes the open note once typing goes idle, and only if it changed
+
+    Dirtiness comes from the editor's own modified flags, so untouched
+    notes are never written. Saves are spaced by auto_save_interval.
+    An edited title is only taken once the title field is done with, and
+    never when another note already has it; until then the body is saved
+    under the note's current name.
+    """
+
+    def __init__(self, dashboard):
+        super().__init__(dashboard)
+        self.dashboard = dashboard
+        self._last_save = 0.0
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.timeout.connect(self._on_idle)
+
+    def enabled(self):
+        return bool(settings.get("auto_save", True))
+
+    def interval(self):
+        return max(0, settings.get("auto_save_interval", 30) or 0)
+
+    def is_dirty(self):
+        """Whether the title or body changed since the note was loaded or saved"""
+        return (self.dashboard.note_text.document().isModified()
+                or self.dashboard.note_title.isModified())
+
+    def note_changed(self):
+        """Restart the idle countdown after an edit"""
+        if self.enabled():
+            self._idle_timer.start(IDLE_DELAY_MS)
+
+    def stop(self):
+        """Cancel a pending auto-save, called once the window is closing"""
+        self._idle_timer.stop()
+
+    def mark_clean(self):
+        """Forget pending changes, called after a note is loaded or saved"""
+        self._idle_timer.stop()
+        self.dashboard.note_text.document().setModified(False)
+        self.dashboard.note_title.setModified(False)
+
+    def flush(self, title_done=True):
+        """Save the open note right away if it is dirty and auto-save is on
+
+        title_done is False while the title may still be being typed.
+        """
+        if not self.enabled() or not self.is_dirty():
+            return False
+        title = self.dashboard.note_title.text().strip()
+        if not title:
+            return False
+        current = self.dashboard.current_note_title
+        if title != current and (not title_done or self.dashboard.title_taken(title)):
+            if title_done:
+                self.dashboard.statusBar().showMessage(
+                    f"A note named '{title}' already exists, press Save to replace it", 6000)
+            if current is None or not self.dashboard.note_text.document().isModified():
+                return False
+            self.dashboard.store_note(keep_title=True)
+            return True
+        self.dashboard.store_note()
+        return True
+
+    def note_saved(self, title_saved=True):
+        """Record a save so the next auto-save respects the interval"""
+        self._last_save = time.monotonic()
+        if title_saved:
+            self.mark_clean()
+        else:
+            self._idle_timer.stop()
+            self.dashboard.note_text.document().setModified(False)
+
+    def _on_idle(self):
+        try:
+            if not self.is_dirty():
+                return
+            wait = self.interval() - (time.monotonic() - self._last_save)
+            if wait > 0:
+                self._idle_timer.start(int(wait * 1000))
+                return
+            self.flush(title_done=not self.dashboard.note_title.hasFocus())
+        except Exception as e:
+            print(f"Auto-save error: {e}")
@@ -3,71 +3,58 @@ Clean dashboard for Cryptex
 """
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                             QLabel, QPushButton, QTextEdit, QLineEdit, 
-                            QListWidget, QMessageBox, QFrame,
-                            QFileDialog, QListWidgetItem, QComboBox)
+                            QListView, QMessageBox, QFrame,
+                            QFileDialog, QComboBox, QInputDialog,
+                            QProgressDialog)
 from PyQt6.QtCore import Qt
-from core.database import load_data, save_data, delete_note, export_vault, import_vault
-from assets.themes import THEMES, generate_qss
+from assets.themes import THEMES, apply_app_theme
+from gui.note_list import NoteListModel
+from gui.write_queue import WriteQueue
+from gui.autosave import AutoSaver
+from gui.perf_overlay import PerfOverlay
 from core.settings import settings
+from core.trace import traced
+from core.merge import POLICY_NEWEST, POLICY_KEEP_BOTH, POLICY_SKIP
 from datetime import datetime
 
+# Merge choices offered on import, in menu order
+MERGE_POLICIES = {
+    "Keep the most recently modified": POLICY_NEWEST,
+    "Keep both (import as a copy)": POLICY_KEEP_BOTH,
+    "Keep mine (skip the imported note)": POLICY_SKIP,
+}
+
 class Dashboard(QMainWindow):
-    def __init__(self, pin):
+    @traced("dashboard_window")
+    def __init__(self, session):
         super().__init__()
-        self.pin = pin
+        self.session = session
         self.current_note_title = None
-        self.notes = {}
+        # Set once closing has started, and once the exit backup is done
+        self.closing = False
+        self.backed_up = False
+        
+        # Vault writes run in the background, the UI hears back via signals
+        self.write_queue = WriteQueue(session, self)
+        self.write_queue.finished.connect(self.on_write_finished)
+        self.write_queue.busy_changed.connect(self.on_write_busy)
+        self.write_queue.merge_progress.connect(self.on_merge_progress)
+        self.write_queue.merged.connect(self.on_merged)
+        self.write_queue.merge_needs_pin.connect(self.on_merge_needs_pin)
+        self.write_queue.merge_failed.connect(self.on_merge_failed)
         
         self.setWindowTitle("Cryptex - Secure Vault")
         self.setMinimumSize(1000, 700)
         self.resize(1200, 800)
         
-        # Apply theme
-        current_theme = settings.get("theme", "cyber_blue")
-        try:
-            self.setStyleSheet(generate_qss(current_theme))
-        except Exception as e:
-            print(f"Theme error: {e}")
-            # Fallback theme
-            self.setStyleSheet("""
-                QMainWindow {
-                    background-color: #1a1a1a;
-                    color: white;
-                }
-                QPushButton {
-                    background-color: #00CFFF;
-                    color: white;
-                    border: none;
-                    border-radius: 6px;
-                    padding: 8px;
-                    font-weight: bold;
-                }
-                QPushButton:hover {
-                    background-color: #0099CC;
-                }
-                QLineEdit, QTextEdit {
-                    background-color: #2a2a2a;
-                    border: 1px solid #00CFFF;
-                    border-radius: 6px;
-                    padding: 8px;
-                    color: white;
-                }
-                QListWidget {
-                    background-color: #2a2a2a;
-                    border: 1px solid #00CFFF;
-                    border-radius: 6px;
-                }
-                QListWidget::item {
-                    padding: 8px;
-                    border-bottom: 1px solid #333;
-                }
-                QListWidget::item:selected {
-                    background-color: #00CFFF;
-                    color: white;
-                }
-            """)
+        # The theme is applied application-wide, normally already by login,
+        # and followed from then on through the settings
+        apply_app_theme(settings.get("theme", "cyber_blue"))
+        settings.subscribe("theme", self.on_theme_setting)
         
         self.setup_ui()
+        # Saves the open note after a typing pause, once setup_ui built the editor
+        self.autosaver = AutoSaver(self)
         self.refresh_notes()
         self.center_window()
     
@@ -116,9 +103,21 @@ class Dashboard(QMainWindow):
             new_btn.clicked.connect(self.new_note)
             sidebar_layout.addWidget(new_btn)
             
+            # Search box
+            self.search_input = QLineEdit()
+            self.search_input.setPlaceholderText("🔍 Search notes...")
+            self.search_input.setClearButtonEnabled(True)
+            # The query is read back from the box, the signal's text is not passed on
+            self.search_input.textChanged.connect(lambda _text: self.refresh_notes())
+            sidebar_layout.addWidget(self.search_input)
+            
             # Notes list
-            self.note_list = QListWidget()
-            self.note_list.itemClicked.connect(self.display_note)
+            self.note_model = NoteListModel(self)
+            self.note_list = QListView()
+            self.note_list.setModel(self.note_model)
+            self.note_list.setUniformItemSizes(True)
+            self.note_list.setEditTriggers(QListView.EditTrigger.NoEditTriggers)
+            self.note_list.clicked.connect(self.display_note)
             sidebar_layout.addWidget(self.note_list)
             
             # Action buttons
@@ -157,6 +156,7 @@ class Dashboard(QMainWindow):
             self.note_title = QLineEdit()
             self.note_title.setPlaceholderText("Note title...")
             self.note_title.textChanged.connect(self.on_text_changed)
+            self.note_title.editingFinished.connect(self.on_title_edited)
             main_layout.addWidget(self.note_title)
             
             # Note content
@@ -166,6 +166,13 @@ class Dashboard(QMainWindow):
             main_layout.addWidget(self.note_text)
             
             layout.addWidget(main_panel)
+            
+            # F12 toggles the p50/p95 overlay
+            self.perf_overlay = PerfOverlay(self)
+            
+            # Non-modal write status
+            self.write_status = QLabel("")
+            self.statusBar().addPermanentWidget(self.write_status)
         except Exception as e:
             print(f"UI setup error: {e}")
     
@@ -187,41 +194,68 @@ class Dashboard(QMainWindow):
         try:
             theme_key = self.theme_combo.currentData()
             if theme_key:
-                self.setStyleSheet(generate_qss(theme_key))
                 settings.set("theme", theme_key)
         except Exception as e:
             print(f"Theme change error: {e}")
     
+    def on_theme_setting(self, theme_key):
+        """Restyle and sync the selector when the theme setting changes"""
+        try:
+            apply_app_theme(theme_key)
+            index = self.theme_combo.findData(theme_key)
+            if index >= 0 and index != self.theme_combo.currentIndex():
+                self.theme_combo.blockSignals(True)
+                self.theme_combo.setCurrentIndex(index)
+                self.theme_combo.blockSignals(False)
+        except Exception as e:
+            print(f"Theme change error: {e}")
+    
+    @traced("refresh_notes")
     def refresh_notes(self):
         """Refresh the notes list"""
         try:
-            self.note_list.clear()
-            self.notes = load_data(self.pin)
-            for title in sorted(self.notes.keys()):
-                item = QListWidgetItem(title)
-                self.note_list.addItem(item)
-            
-            # Update window title
-            count = len(self.notes)
-            if count > 0:
-                self.setWindowTitle(f"Cryptex - {count} notes")
+            # Titles come from the vault and search indexes, bodies stay encrypted
+            query = self.search_input.text().strip()
+            if query:
+                self.note_model.set_titles(self.session.search(query), ranked=True)
             else:
-                self.setWindowTitle("Cryptex - Secure Vault")
+                self.note_model.set_titles(self.session.titles())
+            self.update_note_count()
         except Exception as e:
             print(f"Error loading notes: {e}")
-            self.notes = {}
     
-    def display_note(self, item):
+    def update_note_count(self):
+        """Show the number of notes in the window title"""
+        count = len(self.session)
+        if count > 0:
+            self.setWindowTitle(f"Cryptex - {count} notes")
+        else:
+            self.setWindowTitle("Cryptex - Secure Vault")
+    
+    def select_note(self, title):
+        """Select a note in the list without touching the other rows"""
+        row = self.note_model.row_of(title)
+        if row >= 0:
+            self.note_list.setCurrentIndex(self.note_model.index(row))
+        else:
+            self.note_list.clearSelection()
+    
+    def display_note(self, index):
         """Display selected note"""
         try:
-            if not item:
+            if not index.isValid():
                 return
             
-            title = item.text()
-            if title in self.notes:
+            title = self.note_model.title_at(index.row())
+            self.autosaver.flush()
+            content = self.write_queue.pending_content(title)
+            if content is None:
+                content = self.session.get(title)
+            if content is not None:
                 self.current_note_title = title
                 self.note_title.setText(title)
-                self.note_text.setText(self.notes[title])
+                self.note_text.setText(content)
+                self.autosaver.mark_clean()
                 self.delete_btn.setEnabled(True)
         except Exception as e:
             print(f"Error displaying note: {e}")
@@ -229,8 +263,10 @@ class Dashboard(QMainWindow):
     def new_note(self):
         """Create a new note"""
         try:
+            self.autosaver.flush()
             self.note_title.clear()
             self.note_text.clear()
+            self.autosaver.mark_clean()
             self.current_note_title = None
             self.note_list.clearSelection()
             self.delete_btn.setEnabled(False)
@@ -244,44 +280,77 @@ class Dashboard(QMainWindow):
         try:
             has_title = bool(self.note_title.text().strip())
             self.save_btn.setEnabled(has_title)
+            self.autosaver.note_changed()
         except Exception as e:
             print(f"Error handling text change: {e}")
     
+    def on_title_edited(self):
+        """Auto-save a renamed note once the title field is left"""
+        try:
+            if self.note_title.isModified():
+                self.autosaver.flush()
+        except Exception as e:
+            print(f"Auto-save error: {e}")
+    
+    def title_taken(self, title):
+        """Whether a note other than the open one is called title"""
+        if title == self.current_note_title:
+            return False
+        return title in self.session or self.write_queue.pending_content(title) is not None
+    
     def save_note(self):
         """Save current note"""
         try:
             title = self.note_title.text().strip()
-            content = self.note_text.toPlainText()
-            
             if not title:
                 QMessageBox.warning(self, "Error", "Please enter a note title.")
                 return
             
-            save_data(self.pin, title, content)
-            self.current_note_title = title
-            self.refresh_notes()
-            
-            # Select the saved note
-            for i in range(self.note_list.count()):
-                item = self.note_list.item(i)
-                if item and item.text() == title:
-                    self.note_list.setCurrentRow(i)
-                    break
+            if self.title_taken(title):
+                reply = QMessageBox.question(
+                    self, "Replace Note",
+                    f"A note named '{title}' already exists.\n\nReplace it with this one?",
+                    QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                    QMessageBox.StandardButton.No
+                )
+                if reply != QMessageBox.StandardButton.Yes:
+                    return
             
-            QMessageBox.information(self, "Success", f"Note '{title}' saved successfully!")
+            self.store_note()
         except Exception as e:
             print(f"Error saving note: {e}")
             QMessageBox.critical(self, "Error", f"Failed to save note: {e}")
     
+    def store_note(self, keep_title=False):
+        """Queue the open note for writing, shared by Save and auto-save
+
+        keep_title writes the body under the note's current name and
+        leaves an edited title for later.
+        """
+        previous = self.current_note_title
+        title = previous if keep_title else self.note_title.text().strip()
+        content = self.note_text.toPlainText()
+        
+        self.write_queue.save(title, content)
+        if previous and previous != title:
+            # Title edited on an existing note: rename it
+            self.write_queue.delete(previous)
+            self.note_model.rename_title(previous, title)
+        else:
+            self.note_model.add_title(title)
+        self.current_note_title = title
+        self.autosaver.note_saved(title_saved=not keep_title)
+        self.update_note_count()
+        self.select_note(title)
+        self.delete_btn.setEnabled(True)
+    
     def delete_note(self):
         """Delete selected note"""
         try:
-            current_item = self.note_list.currentItem()
-            if not current_item:
+            title = self.note_model.title_at(self.note_list.currentIndex().row())
+            if not title:
                 return
             
-            title = current_item.text()
-            
             reply = QMessageBox.question(
                 self, "Delete Note",
                 f"Are you sure you want to delete '{title}'?\n\nThis action cannot be undone.",
@@ -292,15 +361,15 @@ class Dashboard(QMainWindow):
             if reply != QMessageBox.StandardButton.Yes:
                 return
             
-            delete_note(self.pin, title)
+            self.write_queue.delete(title)
+            self.note_model.remove_title(title)
             self.note_title.clear()
             self.note_text.clear()
+            self.autosaver.mark_clean()
             self.current_note_title = None
-            self.refresh_notes()
+            self.update_note_count()
             self.delete_btn.setEnabled(False)
             self.save_btn.setEnabled(False)
-            
-            QMessageBox.information(self, "Success", f"Note '{title}' deleted successfully!")
         except Exception as e:
             print(f"Error deleting note: {e}")
             QMessageBox.critical(self, "Error", f"Failed to delete note: {e}")
@@ -314,43 +383,132 @@ class Dashboard(QMainWindow):
                 "Cryptex Vault (*.enc);;All Files (*)"
             )
             if path:
-                export_vault(path)
-                QMessageBox.information(self, "Success", f"Vault exported successfully to:\n{path}")
+                self.write_queue.export_vault(path)
         except Exception as e:
             print(f"Error exporting vault: {e}")
             QMessageBox.critical(self, "Error", f"Failed to export vault: {e}")
     
     def import_vault(self):
-        """Import vault from file"""
+        """Merge the notes of another vault into this one"""
         try:
             path, _ = QFileDialog.getOpenFileName(
                 self, "Import Vault", "",
                 "Cryptex Vault (*.enc);;All Files (*)"
             )
-            if path:
-                reply = QMessageBox.question(
-                    self, "Confirm Import",
-                    "Importing will replace your current vault.\n"
-                    "Make sure you have a backup!\n\n"
-                    "Continue?",
-                    QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
-                    QMessageBox.StandardButton.No
-                )
-                
-                if reply == QMessageBox.StandardButton.Yes:
-                    import_vault(path)
-                    self.refresh_notes()
-                    self.new_note()
-                    QMessageBox.information(self, "Success", "Vault imported successfully!")
+            if not path:
+                return
+            
+            labels = list(MERGE_POLICIES)
+            label, ok = QInputDialog.getItem(
+                self, "Import Vault",
+                "Notes are merged into your vault.\n"
+                "When a note exists in both vaults:",
+                labels, 0, False
+            )
+            if ok:
+                self.start_merge(path, MERGE_POLICIES[label])
         except Exception as e:
             print(f"Error importing vault: {e}")
             QMessageBox.critical(self, "Error", f"Failed to import vault: {e}")
     
+    def start_merge(self, path, policy, pin=None):
+        """Queue a merge and show its progress"""
+        self.autosaver.flush()
+        self.merge_dialog = QProgressDialog("Merging notes...", "Cancel", 0, 0, self)
+        self.merge_dialog.setWindowTitle("Import Vault")
+        self.merge_dialog.setWindowModality(Qt.WindowModality.WindowModal)
+        self.merge_dialog.setMinimumDuration(0)
+        self.merge_dialog.canceled.connect(self.write_queue.cancel_merge)
+        self.merge_dialog.show()
+        self.write_queue.merge_vault(path, policy, pin)
+    
+    def close_merge_dialog(self):
+        dialog = getattr(self, "merge_dialog", None)
+        if dialog is not None:
+            dialog.canceled.disconnect()
+            dialog.close()
+            self.merge_dialog = None
+    
+    def on_merge_progress(self, done, total):
+        """Advance the merge progress bar"""
+        dialog = getattr(self, "merge_dialog", None)
+        if dialog is not None:
+            dialog.setMaximum(total)
+            dialog.setValue(done)
+    
+    def on_merge_needs_pin(self, path, policy):
+        """Ask for the PIN of a vault locked with a different one"""
+        self.close_merge_dialog()
+        pin, ok = QInputDialog.getText(
+            self, "Import Vault",
+            "This vault uses a different PIN.\nEnter its PIN:",
+            QLineEdit.EchoMode.Password
+        )
+        if ok and pin:
+            self.start_merge(path, policy, pin)
+    
+    def on_merge_failed(self, path, message):
+        """Explain why a vault could not be merged"""
+        self.close_merge_dialog()
+        QMessageBox.critical(self, "Import Vault", f"Could not import {path}:\n\n{message}")
+    
+    def on_merged(self, counts):
+        """Report a finished or cancelled merge"""
+        try:
+            self.close_merge_dialog()
+            self.refresh_notes()
+            summary = (f"{counts['added']} added, {counts['updated']} updated, "
+                       f"{counts['renamed']} kept as copies, "
+                       f"{counts['skipped'] + counts['duplicates']} unchanged")
+            if counts["cancelled"]:
+                self.statusBar().showMessage(f"⏹️ Import cancelled: {summary}")
+            else:
+                self.statusBar().showMessage(f"✅ Vault merged: {summary}", 8000)
+        except Exception as e:
+            print(f"Merge status error: {e}")
+    
+    def on_write_busy(self, busy):
+        """Show a non-modal indicator while writes are queued"""
+        if busy:
+            self.write_status.setText("💾 Saving...")
+        else:
+            self.write_status.setText("")
+    
+    def on_write_finished(self, operation, target, ok):
+        """Report a finished background write in the status bar"""
+        try:
+            messages = {
+                "save": f"Note '{target}' saved",
+                "delete": f"Note '{target}' deleted",
+                "export": f"Vault exported to {target}",
+                "merge": "Vault merged",
+            }
+            if operation == "merge" and ok:
+                # on_merged reports the details
+                return
+            if operation == "backup":
+                self.on_exit_backup(ok)
+                return
+            if ok:
+                self.statusBar().showMessage(f"✅ {messages[operation]}", 4000)
+            else:
+                self.statusBar().showMessage(f"❌ Failed to {operation} {target}")
+                if operation in ("save", "delete", "merge"):
+                    # The list was updated optimistically, resync it
+                    self.refresh_notes()
+                if operation == "merge":
+                    self.close_merge_dialog()
+            self.update_note_count()
+        except Exception as e:
+            print(f"Write status error: {e}")
+    
     def keyPressEvent(self, event):
         """Handle key press events"""
         try:
             if event.key() == Qt.Key.Key_Escape:
                 self.close()
+            elif event.key() == Qt.Key.Key_F12:
+                self.perf_overlay.toggle()
             elif event.modifiers() == Qt.KeyboardModifier.ControlModifier:
                 if event.key() == Qt.Key.Key_N:
                     self.new_note()
@@ -363,5 +521,39 @@ class Dashboard(QMainWindow):
             print(f"Key press error: {e}")
     
     def closeEvent(self, event):
-        """Handle close event"""
-        event.accept()
\ No newline at end of file
+        """Handle close event
+
+        With backup on exit the window stays up, disabled, while the
+        backup runs on the write queue, and closes once it is done.
+        """
+        if self.closing:
+            if self.backed_up:
+                event.accept()
+            else:
+                event.ignore()
+            return
+        self.closing = True
+        settings.unsubscribe("theme", self.on_theme_setting)
+        try:
+            self.autosaver.flush()
+        except Exception as e:
+            print(f"Auto-save error: {e}")
+        self.autosaver.stop()
+        if settings.get("backup_on_exit", False):
+            self.setEnabled(False)
+            self.statusBar().showMessage("💾 Backing up vault before closing...")
+            self.write_queue.close_and_backup(settings.get("backup_keep", 30))
+            event.ignore()
+            return
+        self.write_queue.shutdown()
+        self.session.close()
+        event.accept()
+
+    def on_exit_backup(self, ok):
+        """Finish closing once the exit backup is done"""
+        if not ok:
+            QMessageBox.warning(self, "Backup Failed",
+                                "The vault could not be backed up. Your notes are saved.")
+        self.backed_up = True
+        self.write_queue.shutdown()
+        self.close()
\ No newline at end of file
@@ -7,11 +7,14 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
 from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QFont
 import os
-from core.auth import check_pin, set_pin, pin_exists
-from assets.themes import THEMES, generate_qss
+from core.auth import pin_exists
+from gui.unlock import UnlockTask
+from core.trace import traced
+from assets.themes import THEMES, apply_app_theme, set_state
 from core.settings import settings
 
 class LoginWindow(QWidget):
+    @traced("login_window")
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Cryptex - Secure Vault")
@@ -21,43 +24,21 @@ class LoginWindow(QWidget):
         current_theme = settings.get("theme", "cyber_blue")
         self.apply_theme(current_theme)
         
+        # PIN checks and vault unlock run off the GUI thread
+        self.unlock_task = UnlockTask(self)
+        self.unlock_task.unlocked.connect(self.open_dashboard)
+        self.unlock_task.failed.connect(self.on_unlock_failed)
+        
         self.setup_ui()
         self.center_window()
     
     def apply_theme(self, theme_name):
         """Apply the selected theme"""
         try:
-            self.setStyleSheet(generate_qss(theme_name))
-            settings.set("theme", theme_name)
+            if apply_app_theme(theme_name):
+                settings.set("theme", theme_name)
         except Exception as e:
             print(f"Theme error: {e}")
-            # Fallback theme
-            self.setStyleSheet("""
-                QWidget {
-                    background-color: #1a1a1a;
-                    color: white;
-                    font-family: 'Segoe UI';
-                }
-                QPushButton {
-                    background-color: #00CFFF;
-                    color: white;
-                    border: none;
-                    border-radius: 8px;
-                    padding: 12px;
-                    font-weight: bold;
-                }
-                QPushButton:hover {
-                    background-color: #0099CC;
-                }
-                QLineEdit {
-                    background-color: #2a2a2a;
-                    border: 2px solid #00CFFF;
-                    border-radius: 8px;
-                    padding: 15px;
-                    font-size: 24px;
-                    color: white;
-                }
-            """)
     
     def setup_ui(self):
         """Setup the login interface"""
@@ -188,55 +169,56 @@ class LoginWindow(QWidget):
                 self.show_error("PIN must contain only numbers")
                 return
             
-            if pin_exists():
-                # Login
-                if check_pin(pin):
-                    self.submit_btn.setText("✅ Success!")
-                    QTimer.singleShot(500, lambda: self.open_dashboard(pin))
-                else:
-                    self.show_error("Incorrect PIN")
-            else:
-                # Create PIN
+            creating = not pin_exists()
+            if creating:
                 if len(pin) < 4:
                     self.show_error("PIN must be at least 4 digits")
                     return
                 if len(pin) > 6:
                     self.show_error("PIN must be at most 6 digits")
                     return
-                
-                if set_pin(pin):
-                    self.submit_btn.setText("✅ PIN Created!")
-                    QTimer.singleShot(500, lambda: self.open_dashboard(pin))
-                else:
-                    self.show_error("Failed to create PIN")
+            
+            self.set_busy(True)
+            theme = self.theme_combo.currentData() or settings.get("theme", "cyber_blue")
+            self.unlock_task.start(pin, theme, create=creating)
         except Exception as e:
             print(f"PIN handling error: {e}")
             self.show_error("An error occurred. Please try again.")
     
-    def open_dashboard(self, pin):
+    def set_busy(self, busy):
+        """Lock the form while the PIN is being checked"""
+        self.pin_input.setEnabled(not busy)
+        self.submit_btn.setEnabled(not busy)
+        if busy:
+            self.submit_btn.setText("⏳ Unlocking...")
+        elif pin_exists():
+            self.submit_btn.setText("🔓 Unlock Vault")
+        else:
+            self.submit_btn.setText("🔐 Create PIN")
+    
+    def on_unlock_failed(self, message):
+        """Let the user try again after a rejected PIN"""
+        self.set_busy(False)
+        self.submit_btn.setEnabled(False)
+        self.show_error(message)
+        self.pin_input.setFocus()
+    
+    def open_dashboard(self, session):
         """Open the dashboard"""
         try:
             from gui.dashboard import Dashboard
-            self.dashboard = Dashboard(pin)
+            self.submit_btn.setText("✅ Success!")
+            self.dashboard = Dashboard(session)
             self.dashboard.show()
             self.close()
         except Exception as e:
             print(f"Dashboard creation error: {e}")
-            self.show_error("Failed to open dashboard. Please restart the app.")
+            self.on_unlock_failed("Failed to open dashboard. Please restart the app.")
     
     def show_error(self, message):
         """Show error message"""
         try:
-            self.pin_input.setStyleSheet("""
-                QLineEdit {
-                    background-color: #2a2a2a;
-                    border: 2px solid #ff4444;
-                    border-radius: 8px;
-                    padding: 15px;
-                    font-size: 24px;
-                    color: white;
-                }
-            """)
+            set_state(self.pin_input, "error")
             self.pin_input.setPlaceholderText(message)
             self.pin_input.clear()
             
@@ -248,16 +230,7 @@ class LoginWindow(QWidget):
     def reset_input_style(self):
         """Reset input style to normal"""
         try:
-            self.pin_input.setStyleSheet("""
-                QLineEdit {
-                    background-color: #2a2a2a;
-                    border: 2px solid #00CFFF;
-                    border-radius: 8px;
-                    padding: 15px;
-                    font-size: 24px;
-                    color: white;
-                }
-            """)
+            set_state(self.pin_input, "")
             self.pin_input.setPlaceholderText("Enter PIN...")
         except Exception as e:
             print(f"Style reset error: {e}")
@@ -270,5 +243,6 @@ class LoginWindow(QWidget):
     
     def closeEvent(self, event):
         """Handle close event"""
+        self.unlock_task.shutdown()
         QApplication.quit()
         event.accept()
\ No newline at end of file
@@ -0,0 +1,107 @@
+"""
+Note list model for the Cryptex sidebar
+"""
+from bisect import bisect_left
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, Qt
+
+class NoteListModel(QAbstractListModel):
+    """Flat list of note titles with per-row change signals
+
+    The full list is kept sorted, so title -> row is a binary search and
+    inserts, renames and deletes only touch the affected rows. Search
+    results keep their ranking and use a dict for the lookup instead.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._titles = []
+        self._ranked_rows = None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._titles)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        return self._titles[index.row()]
+
+    def set_titles(self, titles, ranked=False):
+        """Replace the whole list, titles must be sorted unless ranked"""
+        self.beginResetModel()
+        self._titles = list(titles)
+        if ranked:
+            self._ranked_rows = {title: row for row, title in enumerate(self._titles)}
+        else:
+            self._ranked_rows = None
+        self.endResetModel()
+
+    def is_ranked(self):
+        """Whether the list shows ranked search results"""
+        return self._ranked_rows is not None
+
+    def title_at(self, row):
+        """Title shown at a row, or None"""
+        if 0 <= row < len(self._titles):
+            return self._titles[row]
+        return None
+
+    def row_of(self, title):
+        """Row of a title, or -1 if it is not listed"""
+        if self._ranked_rows is not None:
+            return self._ranked_rows.get(title, -1)
+        row = bisect_left(self._titles, title)
+        if row < len(self._titles) and self._titles[row] == title:
+            return row
+        return -1
+
+    def add_title(self, title):
+        """Insert a title at its sorted position, returns its row"""
+        row = self.row_of(title)
+        if row >= 0 or self.is_ranked():
+            return row
+        row = bisect_left(self._titles, title)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._titles.insert(row, title)
+        self.endInsertRows()
+        return row
+
+    def remove_title(self, title):
+        """Remove a title if it is listed"""
+        row = self.row_of(title)
+        if row < 0:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._titles[row]
+        if self._ranked_rows is not None:
+            self._ranked_rows = {t: r for r, t in enumerate(self._titles)}
+        self.endRemoveRows()
+
+    def rename_title(self, old, new):
+        """Move a renamed title to its new sorted position, returns its row"""
+        row = self.row_of(old)
+        if row < 0 or self.row_of(new) >= 0:
+            self.remove_title(old)
+            return self.add_title(new)
+
+        if self.is_ranked():
+            self._titles[row] = new
+            self._ranked_rows[new] = self._ranked_rows.pop(old)
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole])
+            return row
+
+        del self._titles[row]
+        target = bisect_left(self._titles, new)
+        self._titles.insert(row, old)
+        if target != row:
+            # beginMoveRows wants the destination as a pre-move position
+            destination = target + 1 if target > row else target
+            self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), destination)
+            del self._titles[row]
+            self._titles.insert(target, new)
+            self.endMoveRows()
+        else:
+            self._titles[row] = new
+        index = self.index(target)
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole])
+        return target
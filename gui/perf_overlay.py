@@ -0,0 +1,59 @@
+"""
+Performance overlay for the Cryptex dashboard
+"""
+from PyQt6.QtWidgets import QLabel
+from PyQt6.QtCore import Qt, QTimer
+from core import trace
+
+REFRESH_MS = 1000
+
+class PerfOverlay(QLabel):
+    """Floating p50/p95 table of traced operations, toggled with F12"""
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setTextFormat(Qt.TextFormat.PlainText)
+        self.setStyleSheet(
+            "background-color: rgba(0, 0, 0, 190); color: #7CFC00; "
+            "font-family: monospace; font-size: 11px; padding: 8px; border-radius: 6px;")
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self.refresh)
+        # Tracing the overlay turned on itself, left running on hide otherwise
+        self._owns_trace = False
+        self.hide()
+
+    def toggle(self):
+        """Show or hide the overlay, tracing runs while it is visible
+
+        Tracing that was already on, from CRYPTEX_TRACE, keeps running
+        after the overlay is hidden.
+        """
+        if self.isVisible():
+            self._timer.stop()
+            self.hide()
+            if self._owns_trace:
+                trace.disable()
+                self._owns_trace = False
+            return
+        if not trace.is_enabled():
+            trace.enable()
+            self._owns_trace = True
+        self.refresh()
+        self.show()
+        self.raise_()
+        self._timer.start(REFRESH_MS)
+
+    def refresh(self):
+        stats = trace.summary()
+        lines = [f"{'operation':<18}{'n':>6}{'p50 ms':>9}{'p95 ms':>9}{'KiB':>9}"]
+        for name in sorted(stats):
+            s = stats[name]
+            lines.append(f"{name:<18}{s['count']:>6}{s['p50']:>9.2f}{s['p95']:>9.2f}"
+                         f"{s['bytes'] / 1024:>9.1f}")
+        if len(lines) == 1:
+            lines.append("no traced operations yet")
+        self.setText("\n".join(lines))
+        self.adjustSize()
+        parent = self.parentWidget()
+        self.move(parent.width() - self.width() - 12, 12)
@@ -0,0 +1,82 @@
+"""
+Background unlock for the Cryptex login window
+"""
+from concurrent.futures import ThreadPoolExecutor
+from PyQt6.QtCore import QObject, pyqtSignal
+from core.auth import check_pin, set_pin
+
+def prewarm(theme_name):
+    """Work the dashboard needs that does not depend on the PIN
+
+    Imports the dashboard module and builds the theme stylesheet into
+    the theme cache.
+    """
+    import gui.dashboard  # noqa: F401
+    from assets.themes import generate_qss
+    try:
+        generate_qss(theme_name)
+    except Exception as e:
+        print(f"Theme error: {e}")
+
+def prefetch():
+    """Pull the parts of the vault unlock reads into the OS cache"""
+    try:
+        from core.database import prefetch_vault
+        prefetch_vault()
+    except Exception as e:
+        print(f"Prefetch error: {e}")
+
+class UnlockTask(QObject):
+    """Checks or creates the PIN on a worker thread and opens the vault
+
+    Argon2 runs next to the prewarm and the vault prefetch, and the vault
+    key is derived as soon as the PIN is accepted, so unlocking costs
+    about max(KDF, I/O) instead of their sum. Unlock never waits for the
+    prefetch, it only warms the cache. Results come back to the GUI
+    thread through signals, and the search index loads after them.
+    """
+
+    # the open session
+    unlocked = pyqtSignal(object)
+    # message for the login window
+    failed = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="unlock")
+
+    def start(self, pin, theme_name, create=False):
+        """Begin unlocking with pin, creating it first when create is set"""
+        warm = self._executor.submit(prewarm, theme_name)
+        self._executor.submit(self._run, pin, create, warm)
+        # Queued behind the prewarm, so it overlaps the KDF
+        self._executor.submit(prefetch)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def _run(self, pin, create, warm):
+        try:
+            if create:
+                if not set_pin(pin):
+                    self.failed.emit("Failed to create PIN")
+                    return
+            elif not check_pin(pin):
+                self.failed.emit("Incorrect PIN")
+                return
+
+            from core.session import open_session
+            session = open_session(pin)
+            try:
+                warm.result()
+            except Exception as e:
+                print(f"Prewarm error: {e}")
+            self.unlocked.emit(session)
+            # Off the unlock path, ready by the time the first search is typed
+            try:
+                session.load_search()
+            except Exception as e:
+                print(f"Search index error: {e}")
+        except Exception as e:
+            print(f"Unlock error: {e}")
+            self.failed.emit("Failed to open dashboard. Please restart the app.")
@@ -0,0 +1,161 @@
+"""
+Background write queue for Cryptex
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PyQt6.QtCore import QObject, pyqtSignal
+from core.database import save_data, delete_note, export_vault
+from core.backup import backup_vault
+from core.merge import merge_vault, WrongPinError
+
+# Progress updates sent to the GUI per merge
+MERGE_PROGRESS_STEPS = 200
+
+class WriteQueue(QObject):
+    """Runs vault writes off the GUI thread, one at a time and in order
+
+    A save queued while an earlier save of the same note is still waiting
+    replaces its content, so bursts of saves turn into a single write.
+    A delete closes off the waiting save, so a save queued after the
+    delete is written by a task of its own, after the delete.
+    Once the queue drains the whole batch is made durable with one fsync.
+    """
+
+    # operation, note title or file path, success
+    finished = pyqtSignal(str, str, bool)
+    busy_changed = pyqtSignal(bool)
+    # notes merged so far, total
+    merge_progress = pyqtSignal(int, int)
+    # merge counts, see core.merge.merge_vault
+    merged = pyqtSignal(object)
+    # path, policy: the vault's PIN is needed to merge it
+    merge_needs_pin = pyqtSignal(str, str)
+    # path, error message: the merge could not be done
+    merge_failed = pyqtSignal(str, str)
+
+    def __init__(self, session, parent=None):
+        super().__init__(parent)
+        self.session = session
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vault-write")
+        self._lock = threading.Lock()
+        self._pending_saves = {}  # title -> [content] of the save waiting for it
+        self._queued = 0
+        self._cancel_merge = threading.Event()
+
+    def save(self, title, content):
+        """Queue a save, merging it with a pending save of the same note"""
+        with self._lock:
+            pending = self._pending_saves.get(title)
+            if pending is not None:
+                pending[0] = content
+                return
+            pending = self._pending_saves[title] = [content]
+        self._submit("save", title, self._run_save, title, pending)
+
+    def delete(self, title):
+        """Queue a delete, dropping any save of the note still waiting"""
+        with self._lock:
+            self._pending_saves.pop(title, None)
+        self._submit("delete", title, delete_note, self.session, title)
+
+    def export_vault(self, path):
+        """Queue a copy of the vault to path"""
+        self._submit("export", path, export_vault, self.session, path)
+
+    def merge_vault(self, path, policy, pin=None):
+        """Queue merging the vault at path into this one"""
+        self._cancel_merge.clear()
+        self._submit("merge", path, self._run_merge, path, policy, pin)
+
+    def close_and_backup(self, keep):
+        """Queue closing the session and backing up the vault, after every queued write"""
+        self._submit("backup", "vault", self._run_backup, keep)
+
+    def cancel_merge(self):
+        """Stop a running merge after the note it is on"""
+        self._cancel_merge.set()
+
+    def pending_content(self, title):
+        """Content of a save that is queued but not written yet, or None"""
+        with self._lock:
+            pending = self._pending_saves.get(title)
+            return pending[0] if pending is not None else None
+
+    def is_busy(self):
+        with self._lock:
+            return self._queued > 0
+
+    def shutdown(self):
+        """Wait for every queued write to finish"""
+        self._executor.shutdown(wait=True)
+
+    def _run_save(self, title, pending):
+        with self._lock:
+            if self._pending_saves.get(title) is not pending:
+                # Superseded by a delete queued after it
+                return True
+            del self._pending_saves[title]
+        return save_data(self.session, title, pending[0])
+
+    def _run_backup(self, keep):
+        self.session.close()
+        return backup_vault(keep)
+
+    def _run_merge(self, path, policy, pin):
+        try:
+            incoming = self.session.open_incoming(path, pin)
+        except WrongPinError as e:
+            print(f"Merge needs a PIN: {e}")
+            self.merge_needs_pin.emit(path, policy)
+            return True
+        except Exception as e:
+            print(f"Error opening vault to merge: {e!r}")
+            self.merge_failed.emit(path, str(e) or type(e).__name__)
+            return False
+        step = max(1, len(incoming) // MERGE_PROGRESS_STEPS)
+
+        def progress(done, total):
+            if done % step == 0 or done == total:
+                self.merge_progress.emit(done, total)
+
+        try:
+            counts = merge_vault(self.session, incoming, policy, progress,
+                                 self._cancel_merge.is_set)
+        except Exception as e:
+            print(f"Error merging vault: {e!r}")
+            self.merge_failed.emit(path, str(e) or type(e).__name__)
+            return False
+        finally:
+            incoming.close()
+        self.merged.emit(counts)
+        return True
+
+    def _submit(self, operation, target, func, *args):
+        with self._lock:
+            self._queued += 1
+            started = self._queued == 1
+        if started:
+            self.busy_changed.emit(True)
+        self._executor.submit(self._run, operation, target, func, *args)
+
+    def _run(self, operation, target, func, *args):
+        try:
+            ok = bool(func(*args))
+        except Exception as e:
+            print(f"Background {operation} error: {e}")
+            ok = False
+        with self._lock:
+            last = self._queued == 1
+        if last:
+            try:
+                # Group commit: one fsync for everything written since the last
+                self.session.sync()
+            except Exception as e:
+                print(f"Error syncing vault: {e}")
+                ok = False
+        with self._lock:
+            self._queued -= 1
+            idle = self._queued == 0
+        self.finished.emit(operation, target, ok)
+        if idle:
+            self.busy_changed.emit(False)
@@ -1,36 +1,102 @@
 """
 Cryptex - Modern Secure Note Manager
 Beautiful, encrypted, and actually works perfectly.
+
+python main.py --startup-profile prints where cold start time goes and
+exits once the login window has painted.
 """
+import time
+
+# Taken before anything heavy is imported, the reference for --startup-profile
+START = time.perf_counter()
+
 import sys
 import os
-from PyQt6.QtWidgets import QApplication
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QFont
+
+# Modules that must stay out of the way until the PIN is entered
+DEFERRED_MODULES = ("argon2", "cryptography", "core.database", "core.session",
+                    "gui.dashboard")
+
+class StartupProfile:
+    """Collects (phase, seconds) marks from process start to first paint"""
+
+    def __init__(self):
+        self.marks = []
+        self._last = START
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.marks.append((phase, now - self._last))
+        self._last = now
+
+    def report(self):
+        print(f"{'phase':<28} {'ms':>8}")
+        for phase, seconds in self.marks:
+            print(f"{phase:<28} {seconds * 1000:>8.1f}")
+        print(f"{'total to first paint':<28} {(self._last - START) * 1000:>8.1f}")
+        loaded = [name for name in DEFERRED_MODULES if name in sys.modules]
+        print(f"deferred modules loaded early: {', '.join(loaded) or 'none'}")
+
+def watch_first_paint(widget, callback):
+    """Call callback once after the first paint event of widget"""
+    from PyQt6.QtCore import QObject, QEvent, QTimer
+
+    class PaintWatcher(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Type.Paint:
+                obj.removeEventFilter(self)
+                # Let the paint finish before taking the mark
+                QTimer.singleShot(0, callback)
+            return False
+
+    watcher = PaintWatcher(widget)
+    widget.installEventFilter(watcher)
 
 def main():
     """Main application entry point"""
+    profile = StartupProfile() if "--startup-profile" in sys.argv else None
     try:
+        if profile:
+            profile.mark("main.py imports")
+
         # Create data directory
         os.makedirs("data", exist_ok=True)
-        
+
+        from PyQt6.QtWidgets import QApplication
+        from PyQt6.QtGui import QFont
+        if profile:
+            profile.mark("import PyQt6")
+
         # Create application
         app = QApplication(sys.argv)
         app.setApplicationName("Cryptex")
         app.setApplicationVersion("3.0")
-        
+
         # Set application font
         font = QFont("Segoe UI", 10)
         app.setFont(font)
-        
+        if profile:
+            profile.mark("QApplication")
+
         # Import and create login window
         from gui.login import LoginWindow
+        if profile:
+            profile.mark("import gui.login")
         login_window = LoginWindow()
+        if profile:
+            profile.mark("LoginWindow()")
         login_window.show()
-        
+
+        if profile:
+            def first_paint():
+                profile.mark("show + first paint")
+                profile.report()
+                app.quit()
+            watch_first_paint(login_window, first_paint)
+
         # Run application
         return app.exec()
-        
+
     except Exception as e:
         print(f"Application error: {e}")
         import traceback
@@ -38,4 +104,4 @@ def main():
         return 1
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(main())